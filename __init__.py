@@ -1,19 +1,35 @@
+from contextlib import nullcontext
+import math
+import os
+import sys
+
 import pyglet
 from pyglet.window import mouse, key
 
 from picker import CellPicker
-from grid import CellState, Grid
-from render import GridRenderer
+from grid import MOVINGAI_MAGIC, CellState, Grid
+from render import GridRenderer, TextureRenderer
 from search import (
+    AStarSearch,
     BestFirstSearch,
+    BidirectionalAStarSearch,
+    BidirectionalBreadthFirstSearch,
     DepthFirstSearch,
+    DijkstraSearch,
     GreedyHillClimbSearch,
+    HierarchicalSearch,
     HillClimbSearch,
+    JumpPointSearch,
+    LifelongPlanningAStarSearch,
     SearchAlgorithm,
     BreadthFirstSearch,
     TabuSearch,
+    WeightedAStarSearch,
 )
-from heuristic import DistanceHeuristic
+from heuristic import DistanceHeuristic, ManhattanHeuristic
+from metrics import FrameProfiler, save_metrics
+from recording import TraceRecorder, TraceReplay
+from worker import SearchWorker
 
 pyglet.options['audio'] = ('xaudio2', 'directsound', 'openal', 'pulse', 'silent')
 
@@ -21,26 +37,74 @@ FONT = "Iosevka Term"
 CELL_SIZE = 30
 OFFSET = (10, 10)
 GRID_SIZE = (30, 16)
+# Maps with more cells than this are drawn as a texture inside a fixed viewport
+RECTANGLE_LIMIT = 128 * 128
+VIEWPORT = (1200, 800)
+ZOOM_STEP = 1.25
+FRAME_TIME = 1 / 60
+# Share of every frame the search may use when running at full speed
+SEARCH_SHARE = 0.5
+# Step: one step per frame, Fast: as many steps as fit in a frame, Instant:
+# run to completion in one go without drawing in between, Background: run in
+# a worker process and draw its progress every frame
+RUN_MODES = ("Step", "Fast", "Instant", "Background")
+# Split view draws every algorithm's search side by side in small panels
+PANEL_GAP = 6
+PANEL_FONT_SIZE = 9
+# The map opened without arguments, and where edits to benchmark maps are saved
+MAP_PATH = "last_open.map"
+# The last search run in the single view is recorded here for replaying
+TRACE_PATH = "last_search.trace"
+# Steps per second when a replay starts
+REPLAY_SPEED = 60
+# The metrics of the searches are written to these files on M
+METRICS_PATHS = ("search_metrics.json", "search_metrics.csv")
+CAPTION = "COS 314 - Search Algorithms"
+# Seconds between updates of the frame profile in the caption
+PROFILE_INTERVAL = 1.0
 SOURCE = pyglet.media.load('tbhYipee.mp3')
 
 
 def calculate_efficiency(grid: Grid) -> float:
-    total = grid.size[0] * grid.size[1]
-    current = 0
-    for cell in grid.cells:
-        if cell.state == CellState.OBSTACLE:
-            total -= 1
-        if cell.state == CellState.NONE:
-            current += 1
-    return current / total
+    total = grid.size[0] * grid.size[1] - grid.count(CellState.OBSTACLE)
+    return grid.count(CellState.NONE) / total if total else 1.0
+
+
+def describe_progress(algo: SearchAlgorithm | SearchWorker) -> str:
+    """Live statistics of a search, from the grid's running counts and its metrics"""
+
+    percentage = round(calculate_efficiency(algo.grid) * 100, 1)
+    frontier = algo.grid.count(CellState.TO_VISITED)
+    return f"{percentage}% unexplored, frontier {frontier}, {algo.metrics.summary()}"
+
+
+def describe_result(algo: SearchAlgorithm | SearchWorker) -> str:
+    if not algo.dest_found():
+        return "No path found"
+
+    percentage = round(calculate_efficiency(algo.grid) * 100, 1)
+    text = f"{percentage}% unexplored"
+    path = algo.path()
+    if path:
+        text += f", path {len(path) - 1}"
+    return f"{text}, {algo.metrics.summary()}"
 
 
 if __name__ == "__main__":
-    window = pyglet.window.Window(caption="COS 314 - Search Algorithms")
+    map_path = sys.argv[1] if len(sys.argv) > 1 else MAP_PATH
+    window = pyglet.window.Window(caption=CAPTION)
     grid = Grid(*GRID_SIZE)
-    grid.load_from_file("last_open.map")
+    grid.load_from_file(map_path)
+    loaded_version = grid.version
 
-    renderer = GridRenderer(grid, CELL_SIZE, (OFFSET[0], OFFSET[1] + CELL_SIZE), 1)
+    renderer: GridRenderer | TextureRenderer
+    if grid.size[0] * grid.size[1] > RECTANGLE_LIMIT:
+        scale = min(VIEWPORT[0] / grid.size[0], VIEWPORT[1] / grid.size[1])
+        renderer = TextureRenderer(
+            grid, scale, (OFFSET[0], OFFSET[1] + CELL_SIZE), VIEWPORT
+        )
+    else:
+        renderer = GridRenderer(grid, CELL_SIZE, (OFFSET[0], OFFSET[1] + CELL_SIZE), 1)
 
     x, y, w, h = renderer.bounding_box
 
@@ -52,16 +116,25 @@ if __name__ == "__main__":
     source_picker = CellPicker(renderer, (0, 0, 255))
     dest_picker = CellPicker(renderer, (0, 255, 0))
 
-    heuristic = DistanceHeuristic()
+    heuristic = DistanceHeuristic(grid.size)
+    manhattan = ManhattanHeuristic(grid.size)
     algos: list[SearchAlgorithm] = [
         BreadthFirstSearch(grid),
+        BidirectionalBreadthFirstSearch(grid),
         DepthFirstSearch(grid),
         BestFirstSearch(grid, heuristic),
         HillClimbSearch(grid, heuristic),
         GreedyHillClimbSearch(grid, heuristic),
         TabuSearch(grid, heuristic),
+        DijkstraSearch(grid),
+        AStarSearch(grid, manhattan),
+        BidirectionalAStarSearch(grid, manhattan),
+        WeightedAStarSearch(grid, manhattan, 2),
+        JumpPointSearch(grid, manhattan),
+        HierarchicalSearch(grid, manhattan),
+        LifelongPlanningAStarSearch(grid, manhattan),
     ]
-
+    renderer.show(algos[0].grid)
 
     labels = [
         pyglet.text.Label(
@@ -79,10 +152,129 @@ if __name__ == "__main__":
     )
 
     active_algo = 0
+    run_mode = 1
     running = False
+    split_view = False
+    panels: list[tuple[TextureRenderer, pyglet.text.Label]] = []
+    recorder: TraceRecorder | None = None
+    workers: dict[SearchAlgorithm, SearchWorker] = {}
+    replay: TraceReplay | None = None
+    replay_clock = 0.0
+    replay_speed = REPLAY_SPEED
+    replay_paused = False
+    profiler: FrameProfiler | None = None
+
+    def create_panels():
+        """Lays out one view per algorithm over the area of the main view"""
+
+        x, y, w, h = renderer.bounding_box
+        cols = math.ceil(math.sqrt(len(algos)))
+        rows = math.ceil(len(algos) / cols)
+        width, height = w // cols - PANEL_GAP, h // rows - PANEL_GAP
+        label_height = PANEL_FONT_SIZE * 2
+        scale = min(width / grid.size[0], (height - label_height) / grid.size[1])
+        for i, algo in enumerate(algos):
+            px = x + i % cols * (width + PANEL_GAP)
+            py = y + (rows - 1 - i // cols) * (height + PANEL_GAP)
+            panel = TextureRenderer(
+                algo.grid,
+                scale,
+                (px, py + label_height),
+                (width, height - label_height),
+            )
+            label = pyglet.text.Label(
+                str(algo), FONT, font_size=PANEL_FONT_SIZE, x=px, y=py
+            )
+            panels.append((panel, label))
+
+    def searches(active: list[SearchAlgorithm]) -> list[SearchAlgorithm | SearchWorker]:
+        """The searches to run and show, with the workers standing in for theirs"""
+
+        return [workers.get(algo, algo) for algo in active]
+
+    def stop_workers():
+        for worker in workers.values():
+            worker.stop()
+        workers.clear()
+
+    def view_at(x: int, y: int) -> GridRenderer | TextureRenderer:
+        """The view that cells under the mouse are picked from"""
+
+        if not split_view:
+            return renderer
+        for panel, _ in panels:
+            if panel.collide_cell(x, y):
+                return panel
+        return panels[0][0]
+
+    def describe_replay() -> str:
+        assert replay
+        text = f"Replay {replay.position}/{len(replay)}"
+        text += ", paused" if replay_paused else f" at {replay_speed:g}/s"
+        if replay.found:
+            text += ", found"
+        return text
+
+    def replay_key(code: int):
+        """Handles a key press while a trace is being replayed"""
+
+        global replay_clock
+        global replay_speed
+        global replay_paused
+        assert replay
+        match code:
+            case key.SPACE:
+                replay_paused = not replay_paused
+            case key.UP:
+                replay_speed *= 2
+            case key.DOWN:
+                replay_speed /= 2
+            case key.MINUS:
+                replay_speed = -replay_speed
+            case key.HOME:
+                replay_clock = 0
+            case key.END:
+                replay_clock = len(replay)
+            case key.COMMA:
+                replay_paused = True
+                replay_clock = replay.position - 1
+            case key.PERIOD:
+                replay_paused = True
+                replay_clock = replay.position + 1
+            case _ if key._0 <= code <= key._9:
+                replay_clock = len(replay) * (code - key._0) // 10
+        replay_clock = max(0, min(replay_clock, len(replay)))
+        replay.seek(int(replay_clock))
+        stats_label.text = describe_replay()
+
+    def profiled(name: str):
+        """Times a part of the frame while the frame profiler is on"""
+
+        return profiler.measure(name) if profiler else nullcontext()
+
+    def show_profile(dt: float):
+        if profiler:
+            window.set_caption(f"{CAPTION} | {profiler.summary()}")
+
+    def save_search_metrics():
+        rows = [
+            {"algorithm": str(algo), **search.metrics.as_dict()}
+            for algo, search in zip(algos, searches(algos))
+            if algo.dest is not None
+        ]
+        for path in METRICS_PATHS:
+            save_metrics(path, rows)
+        print(f"Saved the metrics of {len(rows)} searches")
+
+    def draw_pickers(view: GridRenderer | TextureRenderer):
+        source_picker.renderer = dest_picker.renderer = view
+        source_picker.draw()
+        if source_picker.picked_position:
+            dest_picker.draw()
 
     @window.event
     def on_mouse_motion(x: int, y: int, dx: int, dy: int):
+        source_picker.renderer = dest_picker.renderer = view_at(x, y)
         if not source_picker.picked_position:
             source_picker.set_target_position(x, y)
         elif not dest_picker.picked_position:
@@ -94,13 +286,71 @@ if __name__ == "__main__":
         global source_picker
         global dest_picker
         global active_algo
+        global run_mode
         global running
+        global split_view
+        global recorder
+        global replay
+        global replay_clock
+        global replay_speed
+        global replay_paused
+        global profiler
+        if code == key.F:
+            if profiler:
+                profiler = None
+                pyglet.clock.unschedule(show_profile)
+                window.set_caption(CAPTION)
+            else:
+                profiler = FrameProfiler()
+                pyglet.clock.schedule_interval(show_profile, PROFILE_INTERVAL)
+            return
+        if code == key.P and not running and not split_view:
+            if replay:
+                replay = None
+                stats_label.text = ""
+                labels[active_algo].text = str(algos[active_algo])
+                renderer.show(algos[active_algo].grid)
+            elif os.path.exists(TRACE_PATH):
+                replay = TraceReplay(TRACE_PATH)
+                if replay.grid.size != grid.size:
+                    replay = None
+                    stats_label.text = "Trace is for another map"
+                    return
+                replay_clock = 0
+                replay_speed = REPLAY_SPEED
+                replay_paused = False
+                stats_label.text = describe_replay()
+                labels[active_algo].text = replay.metadata["algorithm"]
+                renderer.show(replay.grid)
+            return
+        if replay:
+            replay_key(code)
+            return
+
         match code:
             case key.R:
-                grid.reset()
+                if recorder:
+                    recorder.finish()
+                    recorder = None
+                stop_workers()
+                for algo in algos:
+                    algo.clear()
+                for (_, label), algo in zip(panels, algos):
+                    label.text = str(algo)
                 source_picker.reset()
                 dest_picker.reset()
                 running = False
+            case key.M:
+                save_search_metrics()
+            case key.S:
+                run_mode = (run_mode + 1) % len(RUN_MODES)
+                if not running:
+                    stats_label.text = f"Speed: {RUN_MODES[run_mode]}"
+            case key.LEFT | key.RIGHT if workers:
+                # Switching away drops the search running in the background
+                stop_workers()
+                running = False
+                stats_label.text = ""
 
         if not running:
             match code:
@@ -113,17 +363,38 @@ if __name__ == "__main__":
                     else:
                         active_algo -= 1
                     print(active_algo)
+                case key.V:
+                    split_view = not split_view
+                    if split_view and not panels:
+                        create_panels()
+                    for (panel, _), algo in zip(panels, algos):
+                        panel.show(algo.grid)
+
+            renderer.show(algos[active_algo].grid)
 
     @window.event
     def on_mouse_press(x: int, y: int, button: int, modifiers):
         global algo
         global running
+        global recorder
+        if replay:
+            return
         global heuristic
+        global manhattan
         global active_algo
         if button == mouse.RIGHT:
-            cell = renderer.collide_cell(x, y)
+            cell = view_at(x, y).collide_cell(x, y)
             if cell:
                 grid.toggle_obstacle(*cell)
+                for worker in workers.values():
+                    worker.toggle_obstacle(*cell)
+
+            # Searches that repair themselves pick up the edit and carry on
+            active = searches(algos if split_view else [algos[active_algo]])
+            replanning = any(algo.dest and not algo.done() for algo in active)
+            if not running and replanning:
+                stats_label.text = f"Replanning ({RUN_MODES[run_mode]})"
+                running = True
 
         if button == mouse.LEFT:
             if not source_picker.picked_position:
@@ -139,12 +410,34 @@ if __name__ == "__main__":
                     dest_picker.picked_position,
                 )
                 heuristic.set_target(dest_picker.picked_position)
-                algos[active_algo].start_search(
-                    source_picker.picked_position, dest_picker.picked_position
-                )
-                stats_label.text = "Running"
+                manhattan.set_target(dest_picker.picked_position)
+                src, dest = source_picker.picked_position, dest_picker.picked_position
+                started = algos if split_view else [algos[active_algo]]
+                trace_path = None if split_view else TRACE_PATH
+                for algo in started:
+                    if RUN_MODES[run_mode] == "Background":
+                        workers[algo] = SearchWorker(algo, src, dest, trace_path)
+                    else:
+                        algo.start_search(src, dest)
+                if not split_view and not workers:
+                    recorder = TraceRecorder(started[0])
+                for (_, label), algo in zip(panels, algos):
+                    label.text = str(algo)
+                stats_label.text = f"Running ({RUN_MODES[run_mode]})"
                 running = True
 
+    @window.event
+    def on_mouse_scroll(x: int, y: int, scroll_x: float, scroll_y: float):
+        if isinstance(renderer, TextureRenderer) and not split_view:
+            renderer.zoom(ZOOM_STEP**scroll_y, x, y)
+
+    @window.event
+    def on_mouse_drag(x: int, y: int, dx: int, dy: int, buttons: int, modifiers):
+        if split_view or not isinstance(renderer, TextureRenderer):
+            return
+        if buttons & mouse.MIDDLE:
+            renderer.pan(dx, dy)
+
     @window.event
     def on_draw():
         global active_algo
@@ -152,35 +445,92 @@ if __name__ == "__main__":
         global stats_label
         global renderer
 
-        window.clear()
-        renderer.update()
-        renderer.draw()
-        source_picker.draw()
-        if source_picker.picked_position:
-            dest_picker.draw()
-
-        labels[active_algo].draw()
-        stats_label.draw()
+        with profiled("on_draw"):
+            window.clear()
+            if split_view:
+                for panel, label in panels:
+                    panel.update()
+                    panel.draw()
+                    draw_pickers(panel)
+                    label.draw()
+            else:
+                renderer.update()
+                renderer.draw()
+                if not replay:
+                    draw_pickers(renderer)
+                labels[active_algo].draw()
+            stats_label.draw()
 
     def update_algo(dt: float):
+        with profiled("update_algo"):
+            advance_searches(dt)
+
+    def advance_searches(dt: float):
         global algos
         global active_algo
+        global run_mode
         global running
         global grid
         global stats_label
+        global recorder
+        global replay_clock
 
+        if replay:
+            clock = replay_clock + dt * replay_speed
+            if not replay_paused and 0 <= clock <= len(replay):
+                replay_clock = clock
+                replay.seek(int(replay_clock))
+                stats_label.text = describe_replay()
+            return
         if not running:
             return
 
-        algo = algos[active_algo]
-        if algo.dest_found():
-            SOURCE.play()
-            percentage = round(calculate_efficiency(grid) * 100, 1)
-            stats_label.text = f"{percentage}% unexplored"
-            running = False
+        active = searches(algos if split_view else [algos[active_algo]])
+        pending = [algo for algo in active if not algo.done()]
+        for algo in pending:
+            if isinstance(algo, SearchWorker):
+                algo.update(FRAME_TIME * SEARCH_SHARE / len(pending))
+                continue
+            match RUN_MODES[run_mode]:
+                case "Step":
+                    algo.run(max_steps=1)
+                case "Fast" | "Background":
+                    algo.run(time_budget=FRAME_TIME * SEARCH_SHARE / len(pending))
+                case "Instant":
+                    algo.run()
+
+        if split_view:
+            for (_, label), algo in zip(panels, searches(algos)):
+                if algo not in pending:
+                    continue
+                if algo.done():
+                    label.text = f"{algo}: {describe_result(algo)}"
+                else:
+                    label.text = f"{algo}: {describe_progress(algo)}"
+
+        if not all(algo.done() for algo in active):
+            if not split_view:
+                mode = RUN_MODES[run_mode]
+                stats_label.text = f"{mode}: {describe_progress(active[0])}"
             return
-        algo.next()
 
-    pyglet.clock.schedule_interval(update_algo, 1 / 60)
+        running = False
+        if recorder:
+            recorder.finish()
+            recorder.save(TRACE_PATH)
+            recorder = None
+        if any(algo.dest_found() for algo in active):
+            SOURCE.play()
+        if split_view:
+            stats_label.text = "All searches done"
+        else:
+            stats_label.text = describe_result(active[0])
+
+    pyglet.clock.schedule_interval(update_algo, FRAME_TIME)
     pyglet.app.run()
-    grid.save_to_file("last_open.map")
+    if grid.version != loaded_version:
+        # Saving would turn a benchmark map's terrain into plain walls
+        with open(map_path, "rb") as file:
+            if file.read(len(MOVINGAI_MAGIC)) == MOVINGAI_MAGIC:
+                map_path = MAP_PATH
+        grid.save_to_file(map_path)
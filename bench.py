@@ -0,0 +1,733 @@
+"""Benchmarks for the grid and search algorithms
+
+Run `python bench.py <name>...` to run benchmarks by name, or without
+arguments to list them.
+"""
+
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+from grid import CellState, Grid
+from heuristic import DistanceHeuristic, ManhattanHeuristic, OctileHeuristic
+from mapgen import GENERATORS, generate
+from movingai import path_cost
+from search import (
+    ALGORITHMS,
+    AStarSearch,
+    BestFirstSearch,
+    BidirectionalAStarSearch,
+    BidirectionalBreadthFirstSearch,
+    BreadthFirstSearch,
+    DepthFirstSearch,
+    DijkstraSearch,
+    HierarchicalSearch,
+    JumpPointSearch,
+    LifelongPlanningAStarSearch,
+    SearchAlgorithm,
+    WeightedAStarSearch,
+    create_algorithm,
+)
+from recording import TraceRecorder, TraceReplay
+
+BENCHMARKS: dict[str, Callable[[], None]] = {}
+
+
+def benchmark(fn: Callable[[], None]) -> Callable[[], None]:
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+def timed(fn: Callable, *args, **kwargs) -> float:
+    start = perf_counter()
+    fn(*args, **kwargs)
+    return perf_counter() - start
+
+
+def random_grid(width: int, height: int, density: float, seed: int = 0) -> Grid:
+    grid = Grid(width, height)
+    rng = np.random.default_rng(seed)
+    grid.set_obstacles(rng.random((height, width)) < density)
+    return grid
+
+
+def load_grid(path: str) -> Grid:
+    grid = Grid(0, 0)
+    grid.load_from_file(path)
+    return grid
+
+
+def clear_cells(grid: Grid, *cells: tuple[int, int]):
+    for cell in cells:
+        if grid.get_state(*cell) == CellState.OBSTACLE:
+            grid.toggle_obstacle(*cell)
+
+
+def random_queries(
+    grid: Grid, count: int, seed: int = 0
+) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+    """Pairs of open cells, or none if the grid has no open cells"""
+
+    free = np.argwhere(grid.obstacles == 0)
+    if len(free) == 0:
+        return []
+    rng = np.random.default_rng(seed)
+    picks = free[rng.integers(len(free), size=(count, 2))].tolist()
+    return [((sx, sy), (dx, dy)) for (sy, sx), (dy, dx) in picks]
+
+
+def check_path(
+    grid: Grid,
+    path: list[tuple[int, int]],
+    src: tuple[int, int],
+    dest: tuple[int, int],
+    diagonal: bool = False,
+):
+    """Asserts that a path goes from `src` to `dest` one open neighbour at a time"""
+
+    assert path[0] == src and path[-1] == dest, (src, dest)
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        dx, dy = abs(ax - bx), abs(ay - by)
+        assert max(dx, dy) == 1 and (diagonal or dx + dy == 1), (src, dest)
+        assert not grid.obstacles[by, bx], (src, dest)
+
+
+@benchmark
+def grid_memory():
+    for size in (1000, 4000):
+        tracemalloc.start()
+        grid = random_grid(size, size, 0.2)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        grid.states[::3] = 2
+        reset = timed(grid.reset)
+        reset_obstacles = timed(grid.reset, reset_obstacles=True)
+        print(
+            f"{size}x{size}: {memory / 1e6:.1f} MB, "
+            f"reset {reset * 1e3:.2f} ms, "
+            f"reset(reset_obstacles=True) {reset_obstacles * 1e3:.2f} ms"
+        )
+
+
+@benchmark
+def search_throughput():
+    # The destination is walled in, so every search exhausts the whole map
+    for size in (100, 316, 1000):
+        for algorithm in (BreadthFirstSearch, DepthFirstSearch):
+            grid = Grid(size, size)
+            grid.toggle_obstacle(size - 1, size - 1)
+            algo = algorithm(grid)
+            algo.start_search((0, 0), (size - 1, size - 1))
+
+            steps = 0
+            start = perf_counter()
+            while algo.open:
+                algo.next()
+                steps += 1
+            elapsed = perf_counter() - start
+            rate = steps / elapsed
+            print(f"{size * size:>8} cells {algo}: {steps} steps, {rate:,.0f} steps/s")
+
+
+@benchmark
+def best_first():
+    queries = [
+        ("last_open.map", load_grid("last_open.map"), (1, 1), (20, 3)),
+        ("last_open.map", load_grid("last_open.map"), (0, 15), (27, 0)),
+    ]
+    for size in (256, 1024):
+        grid = random_grid(size, size, 0.2, seed=3)
+        clear_cells(grid, (0, 0), (size - 1, size - 1))
+        queries.append((f"random {size}x{size}", grid, (0, 0), (size - 1, size - 1)))
+
+    for name, grid, src, dest in queries:
+        heuristic = DistanceHeuristic()
+        heuristic.set_target(dest)
+        algo = BestFirstSearch(grid, heuristic)
+        algo.start_search(src, dest)
+
+        expansions = peak = 0
+        while not algo.dest_found() and algo.open:
+            algo.next()
+            expansions += 1
+            peak = max(peak, len(algo.open))
+        print(f"{name} {src} -> {dest}: {expansions} expansions, peak heap {peak}")
+
+
+def run_to_goal(
+    algo: SearchAlgorithm, src: tuple[int, int], dest: tuple[int, int]
+) -> float:
+    start = perf_counter()
+    algo.start_search(src, dest)
+    while not algo.done():
+        algo.next()
+    return perf_counter() - start
+
+
+@benchmark
+def cost_searches():
+    for size, density in ((256, 0.0), (256, 0.1), (1024, 0.1)):
+        grid = random_grid(size, size, density, seed=5)
+        queries = [
+            ((0, 0), (size - 1, size - 1)),
+            ((size // 4, size // 2), (3 * size // 4, size // 2)),
+        ]
+        for src, dest in queries:
+            clear_cells(grid, src, dest)
+            heuristic = DistanceHeuristic()
+            heuristic.set_target(dest)
+            print(f"{size}x{size}, {density:.0%} walls, {src} -> {dest}")
+            for algo in (
+                BreadthFirstSearch(grid),
+                DijkstraSearch(grid),
+                AStarSearch(grid, heuristic),
+                WeightedAStarSearch(grid, heuristic, 2),
+            ):
+                elapsed = run_to_goal(algo, src, dest)
+                path = algo.path()
+                length = len(path) - 1 if path else "-"
+                expansions = algo.grid.count(CellState.VISITED)
+                print(
+                    f"  {algo}: {expansions} expansions, "
+                    f"path {length}, {elapsed * 1e3:.0f} ms"
+                )
+
+
+@benchmark
+def jump_point():
+    for size in (512, 2048):
+        grid = random_grid(size, size, 0.005, seed=7)
+        queries = [
+            ((0, 0), (size - 1, size - 1)),
+            ((size // 8, size // 2), (7 * size // 8, size // 3)),
+        ]
+        for src, dest in queries:
+            clear_cells(grid, src, dest)
+            heuristic = DistanceHeuristic()
+            heuristic.set_target(dest)
+            print(f"{size}x{size}, 0.5% walls, {src} -> {dest}")
+            algos = (AStarSearch(grid, heuristic), JumpPointSearch(grid, heuristic))
+            lengths = []
+            for algo in algos:
+                steps = 0
+                start = perf_counter()
+                algo.start_search(src, dest)
+                while not algo.dest_found() and algo.open:
+                    algo.next()
+                    steps += 1
+                elapsed = perf_counter() - start
+                path = algo.path()
+                length = len(path) - 1 if path else "-"
+                lengths.append(length)
+                print(f"  {algo}: {steps} expansions, path {length}, {elapsed:.2f} s")
+            assert lengths[0] == lengths[1], lengths
+
+
+@benchmark
+def jump_point_paths():
+    queries = 0
+    for seed in range(200):
+        rng = np.random.default_rng(seed)
+        width, height = rng.integers(1, 40, 2).tolist()
+        grid = random_grid(width, height, rng.uniform(0, 0.5), seed)
+        for src, dest in random_queries(grid, 5, seed):
+            heuristic = DistanceHeuristic()
+            heuristic.set_target(dest)
+            astar, jps = AStarSearch(grid, heuristic), JumpPointSearch(grid, heuristic)
+            run_to_goal(astar, src, dest)
+            run_to_goal(jps, src, dest)
+            expected, path = astar.path(), jps.path()
+            assert (expected is None) == (path is None), (seed, src, dest)
+            if expected is not None and path is not None:
+                assert len(path) == len(expected), (seed, src, dest)
+                check_path(grid, path, src, dest)
+            queries += 1
+    print(f"JPS paths match A* on {queries} queries over 200 random maps")
+
+
+@benchmark
+def heuristic_table():
+    for size in (1000, 4000):
+        heuristic = DistanceHeuristic((size, size))
+        first = timed(heuristic.set_target, (size // 2, size // 3))
+        build = timed(heuristic.set_target, (size // 2, size // 3))
+        timed(heuristic.set_target, (0, 0))
+        cached = timed(heuristic.set_target, (size // 2, size // 3))
+        print(
+            f"{size}x{size}: first target {first * 1e6:.1f} us, "
+            f"table build on reuse {build * 1e3:.1f} ms, "
+            f"cached retarget {cached * 1e6:.1f} us"
+        )
+
+    cells = [(x, y) for x in range(1000) for y in range(0, 1000, 10)]
+    for heuristic in (DistanceHeuristic(), DistanceHeuristic((1000, 1000))):
+        # Tables are only built for targets set more than once
+        heuristic.set_target((500, 300))
+        heuristic.set_target((500, 300))
+        elapsed = timed(lambda: [heuristic.calculate(cell) for cell in cells])
+        mode = "table" if heuristic.table is not None else "direct"
+        print(f"calculate ({mode}): {elapsed / len(cells) * 1e9:.0f} ns/call")
+
+    xs, ys = np.array(cells).T
+    heuristic = DistanceHeuristic()
+    heuristic.set_target((500, 300))
+    elapsed = timed(heuristic.calculate_many, xs, ys)
+    print(f"calculate_many: {elapsed / len(cells) * 1e9:.1f} ns/cell")
+
+    grid = random_grid(1024, 1024, 0.1, seed=5)
+    src, dest = (0, 0), (1023, 1023)
+    clear_cells(grid, src, dest)
+    for heuristic in (
+        DistanceHeuristic(),
+        DistanceHeuristic(grid.size),
+        ManhattanHeuristic(),
+        ManhattanHeuristic(grid.size),
+    ):
+        heuristic.set_target(dest)
+        heuristic.set_target(dest)
+        algo = AStarSearch(grid, heuristic)
+        elapsed = run_to_goal(algo, src, dest)
+        mode = "table" if heuristic.table is not None else "direct"
+        print(
+            f"A* 1024x1024 with {type(heuristic).__name__} ({mode}): "
+            f"{algo.grid.count(CellState.VISITED)} expansions, {elapsed:.2f} s"
+        )
+
+
+def headless_pyglet():
+    import pyglet
+
+    pyglet.options["headless"] = True
+
+
+def headless_renderer(grid: Grid, cell_size: int):
+    headless_pyglet()
+    from render import GridRenderer
+
+    return GridRenderer(grid, cell_size)
+
+
+def headless_texture_renderer(grid: Grid, cell_size: float):
+    headless_pyglet()
+    from render import TextureRenderer
+
+    return TextureRenderer(grid, cell_size, (0, 0), (1200, 800))
+
+
+@benchmark
+def render_frame():
+    grid = Grid(500, 500)
+    renderer = headless_renderer(grid, 2)
+    for full_redraw in (True, False):
+        algo = BreadthFirstSearch(grid)
+        algo.start_search((250, 250), (0, 0))
+        renderer.show(algo.grid)
+        renderer.update()
+
+        frames = 60
+        update = draw = 0.0
+        for _ in range(frames):
+            algo.run(max_steps=100)
+            if full_redraw:
+                algo.grid.all_changed = True
+            update += timed(renderer.update)
+            draw += timed(renderer.draw)
+        mode = "full recolor" if full_redraw else "changed cells only"
+        print(
+            f"500x500, 100 steps/frame, {mode}: "
+            f"update {update / frames * 1e3:.2f} ms, draw {draw / frames * 1e3:.2f} ms"
+        )
+
+
+@benchmark
+def texture_render():
+    size = 4096
+    grid = random_grid(size, size, 0.05, seed=9)
+    start = perf_counter()
+    renderer = headless_texture_renderer(grid, 800 / size)
+    renderer.update()
+    print(f"{size}x{size}: create and full upload {perf_counter() - start:.2f} s")
+
+    algo = BreadthFirstSearch(grid)
+    algo.start_search((size // 2, size // 2), (0, 0))
+    renderer.show(algo.grid)
+    for zoom, label in ((1, "whole map"), (32, "zoomed in 32x")):
+        renderer.zoom(zoom, 600, 400)
+        frames = 30
+        update = draw = 0.0
+        for _ in range(frames):
+            algo.run(max_steps=2000)
+            update += timed(renderer.update)
+            draw += timed(renderer.draw)
+        print(
+            f"  {label}, 2000 steps/frame: update {update / frames * 1e3:.2f} ms, "
+            f"draw {draw / frames * 1e3:.2f} ms"
+        )
+
+
+@benchmark
+def map_io():
+    size = 10000
+    grid = random_grid(size, size, 0.3, seed=11)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, save in (
+            ("text.map", grid.save_text),
+            ("packed.bmap", grid.save_binary),
+            ("bytes.bmap", lambda path: grid.save_binary(path, packed=False)),
+        ):
+            path = os.path.join(directory, name)
+            save_time = timed(save, path)
+            loaded = Grid(0, 0)
+            load_time = timed(loaded.load_from_file, path)
+            assert np.array_equal(loaded.obstacles, grid.obstacles)
+            print(
+                f"{size}x{size} {name}: {os.path.getsize(path) / 1e6:.1f} MB, "
+                f"save {save_time:.2f} s, load {load_time:.3f} s"
+            )
+            del loaded
+
+
+@benchmark
+def components():
+    for size in (1000, 4000):
+        grid = random_grid(size, size, 0.3, seed=13)
+        build = timed(grid.components.rebuild)
+
+        rng = np.random.default_rng(13)
+        cells = rng.integers(0, size, (1000, 2)).tolist()
+        toggles = timed(lambda: [grid.toggle_obstacle(x, y) for x, y in cells])
+        relabel = timed(grid.components.component, 0, 0)
+        print(
+            f"{size}x{size}, 30% walls: label {build * 1e3:.0f} ms, "
+            f"1000 toggles {toggles * 1e3:.1f} ms, relabel after {relabel * 1e3:.0f} ms"
+        )
+
+    # The destination is walled in, which searches used to find out by
+    # exhausting everything reachable from the source
+    size = 500
+    grid = random_grid(size, size, 0.1, seed=13)
+    dest = (size - 2, size - 2)
+    clear_cells(grid, (0, 0), dest)
+    for x, y in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        if grid.get_state(dest[0] + x, dest[1] + y) != CellState.OBSTACLE:
+            grid.toggle_obstacle(dest[0] + x, dest[1] + y)
+    heuristic = ManhattanHeuristic(grid.size)
+    heuristic.set_target(dest)
+    algo = AStarSearch(grid, heuristic)
+    grid.components.component(0, 0)
+    rejected = timed(lambda: (algo.start_search((0, 0), dest), algo.run()))
+    exhausted = run_to_goal(algo, (0, 0), dest)
+    print(
+        f"A* {size}x{size} to a walled-in cell: rejected in {rejected * 1e3:.2f} ms, "
+        f"exhausting the map takes {exhausted:.2f} s"
+    )
+
+
+@benchmark
+def hierarchical():
+    for size in (1000, 4000):
+        grid = random_grid(size, size, 0.1, seed=17)
+        build = timed(grid.hierarchy)
+        hierarchy = grid.hierarchy()
+        nodes = int(hierarchy.node_counts.sum())
+        print(f"{size}x{size}, 10% walls: build {build:.2f} s, {nodes} nodes")
+
+        rng = np.random.default_rng(17)
+        cells = rng.integers(0, size, (100, 2)).tolist()
+        toggles = timed(lambda: [grid.toggle_obstacle(x, y) for x, y in cells])
+        print(f"  toggle with cluster rebuild: {toggles / len(cells) * 1e3:.2f} ms")
+
+        heuristic = ManhattanHeuristic(grid.size)
+        for src, dest in (
+            ((0, 0), (size - 1, size - 1)),
+            ((size // 8, size // 2), (7 * size // 8, size // 3)),
+        ):
+            clear_cells(grid, src, dest)
+            heuristic.set_target(dest)
+            for algo in (
+                HierarchicalSearch(grid, heuristic),
+                AStarSearch(grid, heuristic),
+            ):
+                start = perf_counter()
+                algo.start_search(src, dest)
+                algo.run()
+                path = algo.path()
+                elapsed = perf_counter() - start
+                length = len(path) - 1 if path else "-"
+                print(
+                    f"  {src} -> {dest} {algo}: {elapsed * 1e3:.0f} ms, "
+                    f"path {length}"
+                )
+
+
+@benchmark
+def lpa_edits():
+    checks = 0
+    for seed in range(300):
+        rng = np.random.default_rng(seed)
+        width, height = rng.integers(2, 40, 2).tolist()
+        grid = random_grid(width, height, rng.uniform(0, 0.4), seed)
+        for src, dest in random_queries(grid, 1, seed):
+            heuristic = ManhattanHeuristic(grid.size)
+            heuristic.set_target(dest)
+            heuristic.set_target(dest)
+            algo = LifelongPlanningAStarSearch(grid, heuristic)
+            algo.start_search(src, dest)
+            algo.run()
+            for edit in range(8):
+                # Half the edits are beside the path, the rest anywhere
+                path = algo.path()
+                if path and edit % 2 == 0:
+                    x, y = path[int(rng.integers(len(path)))]
+                    dx, dy = ((1, 0), (-1, 0), (0, 1), (0, -1))[int(rng.integers(4))]
+                    x, y = x + dx, y + dy
+                else:
+                    x, y = int(rng.integers(width)), int(rng.integers(height))
+                if not grid.in_bounds(x, y) or (x, y) in (src, dest):
+                    continue
+                grid.toggle_obstacle(x, y)
+                algo.run()
+
+                fresh = AStarSearch(grid, heuristic)
+                fresh.start_search(src, dest)
+                fresh.run()
+                expected, path = fresh.path(), algo.path()
+                assert algo.dest_found() == fresh.dest_found(), (seed, edit)
+                assert (expected is None) == (path is None), (seed, edit)
+                if expected is not None and path is not None:
+                    assert len(path) == len(expected), (seed, edit)
+                    check_path(grid, path, src, dest)
+                checks += 1
+    print(f"LPA* matches a fresh A* after {checks} single-cell edits")
+
+
+@benchmark
+def replanning():
+    size = 1000
+    grid = random_grid(size, size, 0.1, seed=19)
+    src, dest = (0, size // 2), (size - 1, size // 2)
+    clear_cells(grid, src, dest)
+    heuristic = ManhattanHeuristic(grid.size)
+    heuristic.set_target(dest)
+    grid.components.component(0, 0)
+
+    algo = LifelongPlanningAStarSearch(grid, heuristic)
+    start = perf_counter()
+    algo.start_search(src, dest)
+    steps = algo.run()
+    elapsed = perf_counter() - start
+    print(f"{size}x{size}, 10% walls: first search {steps} steps, {elapsed:.2f} s")
+
+    for share in (0.9, 0.5, 0.1):
+        # Drop a 5x5 block of walls on the current path
+        path = algo.path()
+        assert path is not None
+        x, y = path[int(share * (len(path) - 1))]
+        block = np.zeros(grid.obstacles.shape, dtype=bool)
+        block[y - 2 : y + 3, x - 2 : x + 3] = True
+        cells = np.argwhere(block & (grid.obstacles == 0))
+        start = perf_counter()
+        for cy, cx in cells.tolist():
+            grid.toggle_obstacle(cx, cy)
+        steps = algo.run()
+        replan = perf_counter() - start
+
+        restart = LifelongPlanningAStarSearch(grid, heuristic)
+        start = perf_counter()
+        restart.start_search(src, dest)
+        restart_steps = restart.run()
+        elapsed = perf_counter() - start
+        path, restart_path = algo.path(), restart.path()
+        assert path is not None and restart_path is not None
+        assert len(restart_path) == len(path)
+        print(
+            f"  5x5 walls {share:.0%} along the path: replan {steps} steps, "
+            f"{replan * 1e3:.0f} ms; restart {restart_steps} steps, "
+            f"{elapsed * 1e3:.0f} ms"
+        )
+        grid.unsubscribe(restart)
+
+
+@benchmark
+def adjacency():
+    for size in (1000, 4000):
+        grid = random_grid(size, size, 0.2)
+        build = timed(grid._build_moves)
+        rng = np.random.default_rng(1)
+        cells = rng.integers(0, size, (1000, 2)).tolist()
+        toggle = timed(lambda: [grid.toggle_obstacle(x, y) for x, y in cells])
+        print(
+            f"{size}x{size}: build {build * 1e3:.0f} ms, "
+            f"toggle {toggle / len(cells) * 1e6:.1f} us"
+        )
+
+    size = 1000
+    grid = random_grid(size, size, 0.1, seed=5)
+    src, dest = (0, 0), (size - 1, size - 1)
+    clear_cells(grid, src, dest)
+    for heuristic, diagonal in ((ManhattanHeuristic, False), (OctileHeuristic, True)):
+        h = heuristic(grid.size)
+        h.set_target(dest)
+        for algo in (DijkstraSearch(grid, diagonal), AStarSearch(grid, h, diagonal)):
+            elapsed = run_to_goal(algo, src, dest)
+            expansions = algo.grid.count(CellState.VISITED)
+            moves = "8-way" if diagonal else "4-way"
+            print(
+                f"  {algo} {moves}: {expansions} expansions, "
+                f"{expansions / elapsed:,.0f} expansions/s"
+            )
+
+
+@benchmark
+def recording():
+    size = 1000
+    grid = random_grid(size, size, 0.2)
+    src, dest = (0, 0), (size - 1, size - 1)
+    clear_cells(grid, src, dest)
+    heuristic = ManhattanHeuristic(grid.size)
+    heuristic.set_target(dest)
+
+    algo = AStarSearch(grid, heuristic)
+    algo.start_search(src, dest)
+    plain = timed(algo.run)
+
+    algo.start_search(src, dest)
+    recorder = TraceRecorder(algo)
+    recorded = timed(algo.run)
+    recorder.finish()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "search.trace")
+        save = timed(recorder.save, path)
+        file_size = os.path.getsize(path)
+        replay = TraceReplay(path)
+
+    print(
+        f"{size}x{size} A*: {len(recorder.events)} events, "
+        f"run {plain:.2f} s, recorded {recorded:.2f} s, save {save * 1e3:.0f} ms, "
+        f"{file_size / 1e6:.2f} MB"
+    )
+    rng = np.random.default_rng(0)
+    steps = rng.integers(0, len(replay), 20).tolist()
+    elapsed = timed(lambda: [replay.seek(step) for step in steps])
+    replay.seek(len(replay))
+    assert np.array_equal(replay.grid.states, algo.grid.states)
+    print(f"  random seeks over {len(replay)} steps: {elapsed / 20 * 1e3:.1f} ms each")
+
+
+@benchmark
+def bidirectional():
+    for size, density in ((512, 0.0), (1024, 0.2), (2048, 0.2)):
+        grid = random_grid(size, size, density, seed=17)
+        src, dest = (size // 8, size // 2), (7 * size // 8, size // 2)
+        clear_cells(grid, src, dest)
+        heuristic = ManhattanHeuristic(grid.size)
+        heuristic.set_target(dest)
+        print(f"{size}x{size}, {density:.0%} walls, {src} -> {dest}")
+        pairs = (
+            (BreadthFirstSearch(grid), BidirectionalBreadthFirstSearch(grid)),
+            (AStarSearch(grid, heuristic), BidirectionalAStarSearch(grid, heuristic)),
+        )
+        # BreadthFirstSearch keeps no path, so the other three are compared
+        lengths = set()
+        for one_way, both_ways in pairs:
+            results = []
+            for algo in (one_way, both_ways):
+                start = perf_counter()
+                algo.start_search(src, dest)
+                algo.run()
+                elapsed = perf_counter() - start
+                results.append((algo.grid.count(CellState.VISITED), elapsed))
+                path = algo.path()
+                if path is not None:
+                    lengths.add(len(path))
+            (expanded, elapsed), (bi_expanded, bi_elapsed) = results
+            print(
+                f"  {both_ways}: {bi_expanded} expansions vs {expanded} "
+                f"({bi_expanded / expanded:.0%}), {bi_elapsed:.2f} s vs "
+                f"{elapsed:.2f} s"
+            )
+        assert len(lengths) == 1, lengths
+
+
+@benchmark
+def bidirectional_paths():
+    queries = 0
+    for seed in range(150):
+        rng = np.random.default_rng(seed)
+        width, height = rng.integers(2, 40, 2).tolist()
+        grid = random_grid(width, height, rng.uniform(0, 0.45), seed)
+        for src, dest in random_queries(grid, 5, seed):
+            # BreadthFirstSearch keeps no path, so Dijkstra stands in for it
+            pairs: list[tuple[SearchAlgorithm, SearchAlgorithm, bool]] = [
+                (DijkstraSearch(grid), BidirectionalBreadthFirstSearch(grid), False)
+            ]
+            for heuristic, diagonal in (
+                (ManhattanHeuristic(grid.size), False),
+                (DistanceHeuristic(), False),
+                (OctileHeuristic(grid.size), True),
+            ):
+                heuristic.set_target(dest)
+                pairs.append(
+                    (
+                        AStarSearch(grid, heuristic, diagonal),
+                        BidirectionalAStarSearch(grid, heuristic, diagonal),
+                        diagonal,
+                    )
+                )
+            for one_way, both_ways, diagonal in pairs:
+                one_way.start_search(src, dest)
+                one_way.run()
+                both_ways.start_search(src, dest)
+                both_ways.run()
+                expected, path = one_way.path(), both_ways.path()
+                assert (expected is None) == (path is None), (seed, src, dest)
+                if expected is not None and path is not None:
+                    cost = path_cost(path)
+                    assert abs(cost - path_cost(expected)) < 1e-9, (seed, src, dest)
+                    check_path(grid, path, src, dest, diagonal)
+                queries += 1
+    print(f"Bidirectional path costs match on {queries} queries over 150 random maps")
+
+
+@benchmark
+def map_generation():
+    size = 8192
+    for name in GENERATORS:
+        elapsed = timed(generate, name, size, size, 1)
+        print(f"{size}x{size} {name}: {elapsed:.2f} s")
+
+
+@benchmark
+def search_metrics():
+    size = 512
+    grid = random_grid(size, size, 0.2, seed=19)
+    src, dest = (size // 8, size // 2), (7 * size // 8, size // 2)
+    clear_cells(grid, src, dest)
+    heuristic = ManhattanHeuristic(grid.size)
+    heuristic.set_target(dest)
+    print(f"{size}x{size}, 20% walls, {src} -> {dest}")
+    for name in ALGORITHMS:
+        algo = create_algorithm(name, grid, heuristic)
+        algo.start_search(src, dest)
+        algo.run(max_steps=200_000)
+        m = algo.metrics
+        print(
+            f"  {name}: {m.expansions} expansions, {m.pushes} pushes "
+            f"({m.duplicates} duplicates), peak frontier {m.peak_frontier}, "
+            f"{m.heuristic_evaluations} heuristic, "
+            f"{m.step_time * 1e6:.1f} us/step"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Benchmarks:", ", ".join(BENCHMARKS))
+    for name in sys.argv[1:]:
+        print(f"== {name}")
+        BENCHMARKS[name]()
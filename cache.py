@@ -0,0 +1,155 @@
+"""A cache of search results for queries that are asked again
+
+Results are keyed by the grid's `version`, the algorithm's spec (the
+arguments `search.create_algorithm` builds it from), the source and the
+destination, so any obstacle edit or reload makes the old results
+unreachable. A spec is enough to look a query up, so callers only need to
+build the algorithm when the cache misses. The least recently used
+results are dropped once there are more than `capacity`.
+
+With a file, the cache also survives restarts. Versions are only
+meaningful within one process, so saved results are keyed by the grid's
+`content_hash` instead, and looked up by it when the in-memory cache misses.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+import json
+import os
+
+from grid import Grid
+from metrics import SearchMetrics
+from search import SearchAlgorithm
+
+CACHE_FORMAT = 1
+
+Spec = tuple[str, str | None, float, bool]
+Query = tuple[Spec, tuple[int, int], tuple[int, int]]
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    """What a finished search found, as stored in the cache"""
+
+    found: bool
+    path: tuple[tuple[int, int], ...] | None
+    metrics: SearchMetrics
+
+
+class QueryCache:
+    def __init__(self, capacity: int = 1024, path: str | None = None):
+        """
+        Args:
+            capacity (int, optional): The most results kept in memory and
+                saved. Defaults to 1024.
+            path (str | None, optional): The file the cache is loaded from and
+                saved to. Defaults to None, for a cache in memory only.
+        """
+
+        self.capacity = capacity
+        self.path = path
+        self.results: OrderedDict[tuple[int, Query], CachedResult] = OrderedDict()
+        # Results by content hash: those loaded from the file and those to save
+        self.stored: OrderedDict[tuple[str, Query], CachedResult] = OrderedDict()
+        self.hits = self.misses = 0
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def get(
+        self, grid: Grid, spec: Spec, src: tuple[int, int], dest: tuple[int, int]
+    ) -> CachedResult | None:
+        """The result of the `spec` search of `grid` from `src` to `dest`, if known"""
+
+        query = (spec, src, dest)
+        key = (grid.version, query)
+        stored_key = None
+        if self.path is not None:
+            stored_key = (grid.content_hash(), query)
+
+        result = self.results.get(key)
+        if result is None and stored_key in self.stored:
+            result = self.stored[stored_key]
+            self._remember(self.results, key, result)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.results.move_to_end(key)
+        if stored_key in self.stored:
+            self.stored.move_to_end(stored_key)
+        self.hits += 1
+        return result
+
+    def put(
+        self,
+        grid: Grid,
+        spec: Spec,
+        src: tuple[int, int],
+        dest: tuple[int, int],
+        algo: SearchAlgorithm,
+    ) -> CachedResult:
+        """Stores the result of `algo`, built from `spec`, searching `src` to `dest`"""
+
+        path = algo.path()
+        result = CachedResult(
+            algo.dest_found(),
+            None if path is None else tuple(path),
+            replace(algo.metrics),
+        )
+        query = (spec, src, dest)
+        self._remember(self.results, (grid.version, query), result)
+        if self.path is not None:
+            self._remember(self.stored, (grid.content_hash(), query), result)
+        return result
+
+    def _remember(self, results: OrderedDict, key, result: CachedResult):
+        results[key] = result
+        results.move_to_end(key)
+        while len(results) > self.capacity:
+            results.popitem(last=False)
+
+    def load(self):
+        assert self.path
+        with open(self.path) as file:
+            data = json.load(file)
+        if data.get("format") != CACHE_FORMAT:
+            return
+
+        for entry in data["results"]:
+            name, heuristic, weight, diagonal = entry["spec"]
+            query = (
+                (name, heuristic, weight, diagonal),
+                tuple(entry["src"]),
+                tuple(entry["dest"]),
+            )
+            path = entry["path"]
+            result = CachedResult(
+                entry["found"],
+                None if path is None else tuple(map(tuple, path)),
+                SearchMetrics(**entry["metrics"]),
+            )
+            self._remember(self.stored, (entry["map"], query), result)
+
+    def save(self):
+        """Writes the stored results to the cache's file, replacing it in one go"""
+
+        assert self.path
+        results = [
+            {
+                "map": content_hash,
+                "spec": spec,
+                "src": src,
+                "dest": dest,
+                "found": result.found,
+                "path": result.path,
+                "metrics": vars(result.metrics),
+            }
+            for (content_hash, (spec, src, dest)), result in self.stored.items()
+        ]
+        partial = self.path + ".tmp"
+        with open(partial, "w") as file:
+            json.dump({"format": CACHE_FORMAT, "results": results}, file)
+        os.replace(partial, self.path)
@@ -0,0 +1,167 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from grid import Grid
+
+# The eight cells around a cell in order, so consecutive cells share an edge
+RING = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+
+
+def label_components(obstacles: np.ndarray) -> tuple[np.ndarray, int]:
+    """Labels the 4-connected regions of free cells
+
+    Every row is split into runs of free cells, runs that touch vertically
+    are joined with a vectorized union-find, and each cell takes the label of
+    its run's root.
+
+    Args:
+        obstacles (np.ndarray): The obstacle plane, indexed as `[y, x]`
+
+    Returns:
+        tuple[np.ndarray, int]: The `int32` labels, 0 for obstacles, and one more
+            than the largest label that may have been used
+    """
+
+    free = obstacles == 0
+    starts = free.copy()
+    starts[:, 1:] &= ~free[:, :-1]
+    run = np.cumsum(starts, dtype=np.int32).reshape(free.shape) - 1
+    runs = int(run[-1, -1]) + 1 if run.size else 0
+
+    touching = free[:-1] & free[1:]
+    a, b = run[:-1][touching], run[1:][touching]
+    if len(a):
+        # Cells touching along the same pair of runs are next to each other
+        keep = np.ones(len(a), dtype=bool)
+        keep[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+        a, b = a[keep], b[keep]
+
+    parent = np.arange(runs, dtype=np.int32)
+    while len(a):
+        # Every parent is a root here, so hooking the larger root onto the
+        # smaller one can never create a cycle
+        pa, pb = parent[a], parent[b]
+        apart = pa != pb
+        if not apart.any():
+            break
+        pa, pb = pa[apart], pb[apart]
+        np.minimum.at(parent, np.maximum(pa, pb), np.minimum(pa, pb))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    labels = np.zeros(free.shape, dtype=np.int32)
+    labels[free] = parent[run[free]] + 1
+    return labels, runs + 1
+
+
+class Components:
+    """Connected-component labels of a grid's free cells
+
+    Freeing a cell joins the components around it on the spot; merged
+    labels are forwarded to the one that absorbed them. Blocking a cell can
+    only split its component when its free neighbours are not already joined
+    around it, in which case everything is relabelled on the next query.
+    """
+
+    def __init__(self, grid: "Grid"):
+        self.grid = grid.root
+        self.grid.subscribe(self)
+        self.dirty = True
+
+    def rebuild(self):
+        self.labels, self.next_label = label_components(self.grid.obstacles)
+        self.view = self.labels.reshape(-1).data
+        self.merged: dict[int, int] = {}
+        self.dirty = False
+
+    def obstacles_changed(self, cells: list[int] | None):
+        if cells is None or self.dirty:
+            self.dirty = True
+            return
+
+        w = self.grid.size[0]
+        for i in cells:
+            x, y = i % w, i // w
+            if not self.grid.obstacle_view[i]:
+                self.join(i, x, y)
+            elif self.may_split(x, y):
+                self.dirty = True
+                return
+            else:
+                self.view[i] = 0
+
+    def join(self, i: int, x: int, y: int):
+        w = self.grid.size[0]
+        labels = {
+            self.find(self.view[ny * w + nx])
+            for nx, ny in ((x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1))
+            if self.grid.in_bounds(nx, ny) and self.view[ny * w + nx]
+        }
+        if not labels:
+            self.view[i] = self.next_label
+            self.next_label += 1
+            return
+
+        label = min(labels)
+        for other in labels:
+            if other != label:
+                self.merged[other] = label
+        self.view[i] = label
+
+    def may_split(self, x: int, y: int) -> bool:
+        """Whether blocking `(x, y)` may disconnect the free cells beside it
+
+        The free cells around it form arcs that stay connected without it,
+        so a split is only possible when the free neighbours sharing an edge
+        with it lie on different arcs.
+        """
+
+        w = self.grid.size[0]
+        free = [
+            self.grid.in_bounds(x + dx, y + dy)
+            and not self.grid.obstacle_view[(y + dy) * w + x + dx]
+            for dx, dy in RING
+        ]
+        if all(free):
+            return False
+
+        start = free.index(False)
+        arcs = 0
+        touches_side = False
+        for k in range(1, len(RING) + 1):
+            j = (start + k) % len(RING)
+            if free[j]:
+                touches_side |= j % 2 == 0
+            elif touches_side:
+                arcs += 1
+                touches_side = False
+        return arcs > 1
+
+    def find(self, label: int) -> int:
+        merged = self.merged
+        while label in merged:
+            parent = merged[label]
+            if parent in merged:
+                merged[label] = merged[parent]
+            label = parent
+        return label
+
+    def component(self, x: int, y: int) -> int:
+        """The label of the component containing `(x, y)`, or 0 for obstacles"""
+
+        if self.dirty:
+            self.rebuild()
+        return self.find(self.view[y * self.grid.size[0] + x])
+
+    def connected(self, a: tuple[int, int], b: tuple[int, int]) -> bool:
+        """Whether a path of free cells joins `a` and `b`"""
+
+        if not (self.grid.in_bounds(*a) and self.grid.in_bounds(*b)):
+            return False
+        label = self.component(*a)
+        return label != 0 and label == self.component(*b)
@@ -1,5 +1,15 @@
-from dataclasses import dataclass
+from array import array
 from enum import Enum
+import hashlib
+from itertools import count
+from math import sqrt
+import struct
+import weakref
+
+import numpy as np
+
+from components import Components
+from hierarchy import Hierarchy
 
 
 class CellState(Enum):
@@ -8,101 +18,610 @@ class CellState(Enum):
     VISITED = (7, 220, 227)
     OBSTACLE = (255, 255, 255)
 
+    @property
+    def code(self) -> int:
+        return STATE_CODES[self]
+
+
+# Cell states are stored as their index into STATES
+STATES = tuple(CellState)
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+PALETTE = np.array([state.value for state in STATES], dtype=np.uint8)
+
+_NONE = CellState.NONE.code
+_TO_VISITED = CellState.TO_VISITED.code
+_VISITED = CellState.VISITED.code
+_OBSTACLE = CellState.OBSTACLE.code
+
+# The moves to the neighbours of a cell, orthogonal ones first in the order
+# the searches expand them. Bit `k` of a cell's entry in `Grid.moves` is set
+# when the move to `DIRECTIONS[k]` is open.
+DIRECTIONS = ((-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1))
+ORTHOGONAL = 0b00001111
+ALL_DIRECTIONS = 0b11111111
+DIAGONAL_COST = sqrt(2)
+
+# Binary maps start with this header, followed by the obstacle plane in
+# row-major order from y = 0, either bit-packed or as one byte per cell
+BINARY_MAGIC = b"SVMP"
+BINARY_SUFFIX = ".bmap"
+BINARY_HEADER = struct.Struct("<4sBBxxII")
+BINARY_VERSION = 1
+FLAG_PACKED = 1
+
+# Every obstacle layout gets a new number from here, so versions of
+# different grids never collide
+_VERSIONS = count(1)
+
+# MovingAI benchmark maps start with a `type` line, followed by the height,
+# the width and a `map` line. Their rows run from the top down.
+MOVINGAI_MAGIC = b"type"
+# Terrain that can be walked on; trees, water and walls are obstacles
+MOVINGAI_PASSABLE = b".GS"
+
 
-@dataclass
 class GridCell:
-    pos: tuple[int, int]
-    state: CellState = CellState.NONE
+    """A view of a single cell, reading and writing through to the grid's arrays"""
+
+    __slots__ = ("grid", "pos")
+
+    def __init__(self, grid: "Grid", pos: tuple[int, int]):
+        self.grid = grid
+        self.pos = pos
+
+    @property
+    def state(self) -> CellState:
+        return self.grid.get_state(*self.pos)
+
+    @state.setter
+    def state(self, state: CellState):
+        self.grid.set_state(*self.pos, state)
 
     @property
     def is_empty(self):
-        return self.state in [CellState.NONE, CellState.TO_VISITED, CellState.VISITED]
+        return self.state != CellState.OBSTACLE
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, GridCell):
+            return NotImplemented
+        return self.grid is other.grid and self.pos == other.pos
+
+    def __repr__(self) -> str:
+        return f"GridCell(pos={self.pos}, state={self.state})"
 
 
 class Grid:
+    """A grid of cells backed by two contiguous `uint8` planes
+
+    `states` holds the search state code of every cell and `obstacles` is 1
+    where a cell is blocked. Both are indexed as `[y, x]`; `state_view` and
+    `obstacle_view` are flat views over them for fast per-cell access.
+    Obstacle cells always have the `NONE` search state.
+
+    While `track_changes` is set, as renderers do for the grids they show,
+    the flat indices of cells changed since the last `flush_changes` are
+    collected in `changes`. `all_changed` is set after bulk edits. Headless
+    grids leave tracking off, since nothing would ever flush the set.
+
+    An overlay (see `overlay`) is a grid with its own search states that
+    shares the obstacles of a base grid. Obstacle edits always go through
+    the base, which tells its overlays and other listeners about them.
+
+    `moves` holds the open directions of every cell as a bitmask, and
+    `move_table` turns a bitmask into the flat offsets and costs of its
+    moves, so the neighbours of a cell take one lookup. A diagonal move is
+    open when both orthogonal cells beside it are free as well. The masks
+    are built on first use and kept up to date around every toggled cell.
+
+    `version` changes with every obstacle edit and reload, and is never
+    shared with another grid, so it identifies the obstacle layout a
+    result was computed on.
+    """
+
+    size: tuple[int, int]
+    states: np.ndarray
+    obstacles: np.ndarray
+
     def __init__(self, width: int, height: int):
+        self.base: Grid | None = None
+        self.listeners: weakref.WeakSet = weakref.WeakSet()
+        self._components: Components | None = None
+        self._hierarchies: dict[int, Hierarchy] = {}
+        # When set, every state change and obstacle toggle is appended as
+        # `index << 3 | code`, with obstacle toggles using the OBSTACLE code
+        self.journal: array | None = None
+        self.track_changes = False
+        self._allocate(width, height)
+
+    @classmethod
+    def from_obstacles(cls, obstacles: np.ndarray) -> "Grid":
+        """Creates a grid that uses an existing `uint8` obstacle array as its storage"""
+
+        grid = cls(0, 0)
+        grid._allocate(obstacles.shape[1], obstacles.shape[0], obstacles)
+        return grid
+
+    def _allocate(self, width: int, height: int, obstacles: np.ndarray | None = None):
         self.size = (width, height)
-        self.cells = [GridCell((i % width, i // width)) for i in range(width * height)]
+        self._moves: np.ndarray | None = None
+        self.states = np.zeros((height, width), dtype=np.uint8)
+        if obstacles is None:
+            obstacles = np.zeros((height, width), dtype=np.uint8)
+        self.obstacles = obstacles
+        self.state_view = self.states.reshape(-1).data
+        self.obstacle_view = self.obstacles.reshape(-1).data
+        self.changes: set[int] = set()
+        self.all_changed = True
+        self._version = next(_VERSIONS)
+        self._hash: tuple[int, str] | None = None
+
+        blocked = int(np.count_nonzero(obstacles))
+        self.counts = [width * height - blocked, 0, 0, blocked]
+
+    def _reload(self, width: int, height: int, obstacles: np.ndarray):
+        root = self.root
+        root._allocate(width, height, obstacles)
+        root._notify(None)
+
+    @property
+    def root(self) -> "Grid":
+        """The grid that owns the obstacles: this grid, or an overlay's base"""
+
+        return self if self.base is None else self.base
+
+    @property
+    def version(self) -> int:
+        """The number of the current obstacle layout, shared with the overlays"""
+
+        return self.root._version
+
+    def content_hash(self) -> str:
+        """A digest of the size and obstacles, computed once per version
+
+        Unlike `version`, it is the same for the same layout in any process.
+        """
+
+        root = self.root
+        if root._hash is None or root._hash[0] != root._version:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(struct.pack("<II", *root.size))
+            digest.update(np.ascontiguousarray(root.obstacles != 0).data)
+            root._hash = (root._version, digest.hexdigest())
+        return root._hash[1]
+
+    def overlay(self) -> "Grid":
+        """Creates a grid with its own search states over this grid's obstacles
+
+        The overlay shares the obstacle array, so it costs one byte per cell
+        and follows every obstacle edit and reload of its base.
+        """
+
+        root = self.root
+        overlay = Grid(0, 0)
+        overlay.base = root
+        overlay._allocate(*root.size, root.obstacles)
+        root.subscribe(overlay)
+        return overlay
+
+    @property
+    def components(self) -> Components:
+        """The connected components of the free cells, labelled on first use"""
+
+        root = self.root
+        if root._components is None:
+            root._components = Components(root)
+        return root._components
+
+    def hierarchy(self, cluster_size: int = 16) -> Hierarchy:
+        """The HPA* abstraction with clusters of the given size, built on first use"""
+
+        root = self.root
+        if cluster_size not in root._hierarchies:
+            root._hierarchies[cluster_size] = Hierarchy(root, cluster_size)
+        hierarchy = root._hierarchies[cluster_size]
+        hierarchy.ensure_built()
+        return hierarchy
+
+    @property
+    def moves(self) -> memoryview:
+        """The open directions of every cell as a flat view of bitmasks"""
+
+        root = self.root
+        if root._moves is None:
+            root._build_moves()
+        return root._move_view
+
+    @property
+    def move_table(self) -> list[tuple[tuple[int, float], ...]]:
+        """For every bitmask, the flat offset and cost of each of its moves"""
+
+        root = self.root
+        if root._moves is None:
+            root._build_moves()
+        return root._move_table
+
+    def neighbors(self, i: int, directions: int = ORTHOGONAL):
+        """The free cells next to the cell at flat index `i`, with each move's cost
+
+        Args:
+            i (int): The flat index of the cell
+            directions (int, optional): A bitmask of the directions to follow.
+                Defaults to ORTHOGONAL.
+        """
+
+        for offset, cost in self.move_table[self.moves[i] & directions]:
+            yield i + offset, cost
+
+    def _build_moves(self):
+        w, h = self.size
+        free = np.zeros((h + 2, w + 2), dtype=bool)
+        free[1:-1, 1:-1] = self.obstacles == 0
+
+        def towards(dx: int, dy: int) -> np.ndarray:
+            return free[1 + dy : h + 1 + dy, 1 + dx : w + 1 + dx]
+
+        moves = np.zeros((h, w), dtype=np.uint8)
+        for bit, (dx, dy) in enumerate(DIRECTIONS):
+            open_ = towards(0, 0) & towards(dx, dy)
+            if dx and dy:
+                open_ &= towards(dx, 0) & towards(0, dy)
+            moves |= open_.astype(np.uint8) << bit
+
+        if self._moves is not None and self._moves.shape == moves.shape:
+            self._moves[:] = moves
+            return
+        self._moves = moves
+        self._move_view = moves.reshape(-1).data
+        offsets = [
+            (dy * w + dx, DIAGONAL_COST if dx and dy else 1) for dx, dy in DIRECTIONS
+        ]
+        self._move_table = [
+            tuple(move for bit, move in enumerate(offsets) if mask >> bit & 1)
+            for mask in range(256)
+        ]
+
+    def _update_moves(self, x: int, y: int):
+        """Recomputes the masks of the cells whose moves may pass `(x, y)`"""
+
+        w = self.size[0]
+        blocked = self.obstacle_view
+        for cy in range(y - 1, y + 2):
+            for cx in range(x - 1, x + 2):
+                if not self.in_bounds(cx, cy):
+                    continue
+                i = cy * w + cx
+                mask = 0
+                if not blocked[i]:
+                    free = [
+                        self.in_bounds(cx + dx, cy + dy)
+                        and not blocked[(cy + dy) * w + cx + dx]
+                        for dx, dy in DIRECTIONS
+                    ]
+                    for bit in range(4):
+                        mask |= free[bit] << bit
+                    for bit in range(4, 8):
+                        # Diagonals need the orthogonal cells on both sides
+                        side, other = bit - 4, (bit - 3) % 4
+                        mask |= (free[bit] and free[side] and free[other]) << bit
+                self._move_view[i] = mask
+
+    def subscribe(self, listener):
+        """Calls `listener.obstacles_changed(cells)` after every obstacle edit
+
+        `cells` holds the flat indices of the toggled cells, or is None after
+        bulk edits and reloads. Listeners are only referenced weakly.
+        """
+
+        self.root.listeners.add(listener)
+
+    def unsubscribe(self, listener):
+        self.root.listeners.discard(listener)
+
+    def _notify(self, cells: list[int] | None):
+        for listener in list(self.listeners):
+            listener.obstacles_changed(cells)
+
+    def obstacles_changed(self, cells: list[int] | None):
+        """Brings an overlay's states and counts in line with its base's obstacles"""
+
+        base = self.root
+        if base.obstacles is not self.obstacles:
+            self._allocate(*base.size, base.obstacles)
+        elif cells is None:
+            self.states[self.obstacles != 0] = _NONE
+            self.all_changed = True
+            self._recount()
+        else:
+            for i in cells:
+                self._obstacle_toggled(i)
+
+    def _recount(self):
+        totals = np.bincount(self.states.ravel(), minlength=_OBSTACLE)
+        obstacles = int(np.count_nonzero(self.obstacles))
+        self.counts = [
+            int(totals[_NONE]) - obstacles,
+            int(totals[_TO_VISITED]),
+            int(totals[_VISITED]),
+            obstacles,
+        ]
+
+    @property
+    def cells(self):
+        w, h = self.size
+        for i in range(w * h):
+            yield GridCell(self, (i % w, i // w))
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.size[0] and 0 <= y < self.size[1]
 
     def get_cell(self, x: int, y: int) -> GridCell | None:
-        if x < 0 or x >= self.size[0]:
-            return None
-        if y < 0 or y >= self.size[1]:
+        if not self.in_bounds(x, y):
             return None
 
-        return self.cells[y * self.size[0] + x]
+        return GridCell(self, (x, y))
 
-    def want_to_visit(self, x: int, y: int) -> bool:
-        cell = self.get_cell(x, y)
-        if not cell:
+    def get_state(self, x: int, y: int) -> CellState:
+        i = y * self.size[0] + x
+        if self.obstacle_view[i]:
+            return CellState.OBSTACLE
+        return STATES[self.state_view[i]]
+
+    def set_state(self, x: int, y: int, state: CellState):
+        is_obstacle = self.obstacle_view[y * self.size[0] + x]
+        if (state == CellState.OBSTACLE) != bool(is_obstacle):
+            self.toggle_obstacle(x, y)
+        if state != CellState.OBSTACLE:
+            self._mark(x, y, state.code)
+
+    def _mark(self, x: int, y: int, code: int) -> bool:
+        if not self.in_bounds(x, y):
             return False
-        if cell.state == CellState.OBSTACLE:
+        i = y * self.size[0] + x
+        if self.obstacle_view[i]:
             return False
-        cell.state = CellState.TO_VISITED
+
+        self.counts[self.state_view[i]] -= 1
+        self.counts[code] += 1
+        self.state_view[i] = code
+        if self.track_changes:
+            self.changes.add(i)
+        if self.journal is not None:
+            self.journal.append(i << 3 | code)
         return True
 
+    def mark_cells(self, cells: np.ndarray, codes: np.ndarray):
+        """Sets the search states of many cells at once
+
+        Args:
+            cells (np.ndarray): Flat cell indices; when a cell appears more
+                than once, its last entry wins
+            codes (np.ndarray): The state code for every entry of `cells`;
+                obstacle codes raise a ValueError
+        """
+
+        if np.any(np.asarray(codes) >= _OBSTACLE):
+            raise ValueError("mark_cells only sets search states, not obstacles")
+
+        cells, last = np.unique(np.asarray(cells)[::-1], return_index=True)
+        codes = np.asarray(codes, dtype=np.uint8)[::-1][last]
+        free = self.obstacles.reshape(-1)[cells] == 0
+        cells, codes = cells[free], codes[free]
+
+        states = self.states.reshape(-1)
+        added = np.bincount(codes, minlength=_OBSTACLE)
+        removed = np.bincount(states[cells], minlength=_OBSTACLE)
+        states[cells] = codes
+        for code, change in enumerate((added - removed).tolist()):
+            self.counts[code] += change
+        if self.track_changes:
+            self.changes.update(cells.tolist())
+        if self.journal is not None:
+            self.journal.extend((cells << 3 | codes).tolist())
+
+    def want_to_visit(self, x: int, y: int) -> bool:
+        return self._mark(x, y, _TO_VISITED)
+
     def visit(self, x: int, y: int) -> bool:
-        cell = self.get_cell(x, y)
-        if not cell:
-            return False
-        if cell.state == CellState.OBSTACLE:
-            return False
-        cell.state = CellState.VISITED
-        return True
+        return self._mark(x, y, _VISITED)
 
     def toggle_obstacle(self, x: int, y: int) -> bool:
-        cell = self.get_cell(x, y)
-        if not cell:
+        if self.base is not None:
+            return self.base.toggle_obstacle(x, y)
+        if not self.in_bounds(x, y):
             return False
 
-        if cell.state == CellState.OBSTACLE:
-            cell.state = CellState.NONE
+        i = y * self.size[0] + x
+        self.obstacle_view[i] ^= 1
+        self._version = next(_VERSIONS)
+        if self._moves is not None:
+            self._update_moves(x, y)
+        self._obstacle_toggled(i)
+        self._notify([i])
+        return True
+
+    def _obstacle_toggled(self, i: int):
+        if self.obstacle_view[i]:
+            self.counts[self.state_view[i]] -= 1
+            self.state_view[i] = _NONE
+            self.counts[_OBSTACLE] += 1
         else:
-            cell.state = CellState.OBSTACLE
+            self.counts[_OBSTACLE] -= 1
+            self.counts[_NONE] += 1
+        if self.track_changes:
+            self.changes.add(i)
+        if self.journal is not None:
+            self.journal.append(i << 3 | _OBSTACLE)
 
-        return True
+    def set_obstacles(self, mask: np.ndarray, obstacle: bool = True):
+        """Adds or removes obstacles for every cell selected by a mask
+
+        Args:
+            mask (np.ndarray): A boolean array with the same shape as `obstacles`
+            obstacle (bool, optional): Whether the cells become obstacles.
+                Defaults to True.
+        """
+
+        if self.base is not None:
+            return self.base.set_obstacles(mask, obstacle)
+
+        mask = np.asarray(mask, dtype=bool)
+        self.obstacles[mask] = obstacle
+        self._version = next(_VERSIONS)
+        if obstacle:
+            self.states[mask] = _NONE
+        if self._moves is not None:
+            self._build_moves()
+        self.all_changed = True
+        self._recount()
+        self._notify(None)
+
+    def count(self, state: CellState) -> int:
+        return self.counts[state.code]
+
+    def flush_changes(self) -> list[int] | None:
+        """Takes the flat indices of the cells changed since the last flush
+
+        Returns:
+            list[int] | None: The changed cells, or None if every cell may have changed
+        """
+
+        changes = None if self.all_changed else list(self.changes)
+        self.changes.clear()
+        self.all_changed = False
+        return changes
+
+    def code_at(self, i: int) -> int:
+        """The state code of the cell at flat index `i`, with obstacles included"""
+
+        return _OBSTACLE if self.obstacle_view[i] else self.state_view[i]
+
+    def codes(self) -> np.ndarray:
+        """The state codes of every cell with obstacles included, indexed as `[y, x]`"""
+
+        return np.where(self.obstacles != 0, np.uint8(_OBSTACLE), self.states)
 
     def reset(self, reset_obstacles=False):
-        for cell in self.cells:
-            if cell.is_empty:
-                cell.state = CellState.NONE
-            elif reset_obstacles:
-                cell.state = CellState.NONE
+        self.states.fill(_NONE)
+        self.all_changed = True
+        if reset_obstacles:
+            self.root.set_obstacles(self.obstacles != 0, False)
+        else:
+            obstacles = self.counts[_OBSTACLE]
+            self.counts = [self.obstacles.size - obstacles, 0, 0, obstacles]
 
     def load_from_file(self, path: str):
-        lines = []
-        with open(path, "r+") as file:
-            lines = file.readlines()
+        magic = _file_magic(path)
+        if magic == BINARY_MAGIC:
+            self.load_binary(path)
+        elif magic == MOVINGAI_MAGIC:
+            self.load_movingai(path)
+        else:
+            self.load_text(path)
+
+    def save_to_file(self, path: str):
+        if path.endswith(BINARY_SUFFIX):
+            self.save_binary(path)
+        elif _file_magic(path) == MOVINGAI_MAGIC:
+            self.save_movingai(path)
+        else:
+            self.save_text(path)
 
-        w, h, *lines = lines
+    def load_text(self, path: str):
+        with open(path, "rb") as file:
+            w, h, *lines = file.read().splitlines()
         w, h = int(w), int(h)
 
-        self.size = (w, h)
-        self.cells = [GridCell((i % w, i // w)) for i in range(w * h)]
+        obstacles = np.zeros((h, w), dtype=np.uint8)
         for y, line in enumerate(reversed(lines)):
-            for x, c in enumerate(line):
-                cell = self.get_cell(x, y)
-                print(x, y)
-                if not cell:
-                    continue
-                match c:
-                    case ".":
-                        cell.state = CellState.NONE
-                    case "#":
-                        cell.state = CellState.OBSTACLE
+            if y >= h:
+                break
+            row = np.frombuffer(line[:w], dtype=np.uint8)
+            obstacles[y, : len(row)] = row == ord("#")
+        self._reload(w, h, obstacles)
 
-    def save_to_file(self, path: str):
-        lines = [str(self.size[0]) + "\n", str(self.size[1])]
-        for y in range(self.size[1] - 1, -1, -1):
-            line = "\n"
-            for x in range(self.size[0]):
-                cell = self.get_cell(x, y)
-                assert cell
-                if cell.state == CellState.OBSTACLE:
-                    line += "#"
-                else:
-                    line += "."
-            lines.append(line)
-
-        with open(path, "w+") as file:
-            file.writelines(lines)
+    def save_text(self, path: str):
+        w, h = self.size
+        text = np.full((h, w + 1), ord("\n"), dtype=np.uint8)
+        text[:, 1:] = np.where(self.obstacles[::-1] != 0, ord("#"), ord("."))
+
+        with open(path, "wb") as file:
+            file.write(f"{w}\n{h}".encode())
+            file.write(text.data)
+
+    def load_binary(self, path: str):
+        """Loads a binary map through a copy-on-write memory map
+
+        Unpacked planes become the obstacle array without being copied and
+        packed planes are unpacked in one pass. Edits never reach the file.
+        """
+
+        with open(path, "rb") as file:
+            header = file.read(BINARY_HEADER.size)
+        magic, version, flags, w, h = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"{path} is not a version {BINARY_VERSION} binary map")
+
+        offset = BINARY_HEADER.size
+        if w * h == 0:
+            obstacles = np.zeros((h, w), dtype=np.uint8)
+        elif flags & FLAG_PACKED:
+            plane = np.memmap(path, np.uint8, "r", offset, ((w * h + 7) // 8,))
+            obstacles = np.unpackbits(np.asarray(plane), count=w * h).reshape(h, w)
+        else:
+            obstacles = np.memmap(path, np.uint8, "c", offset, (h, w))
+        self._reload(w, h, obstacles)
+
+    def save_binary(self, path: str, packed: bool = True):
+        w, h = self.size
+        flags = FLAG_PACKED if packed else 0
+        obstacles = self.obstacles != 0
+        plane = np.packbits(obstacles) if packed else obstacles.view(np.uint8)
+
+        with open(path, "wb") as file:
+            file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flags, w, h))
+            file.write(np.ascontiguousarray(plane).data)
+
+    def load_movingai(self, path: str):
+        """Loads a MovingAI benchmark map
+
+        The map's top row ends up at the largest y, as it is drawn. Only
+        passable and impassable terrain is kept.
+        """
+
+        with open(path, "rb") as file:
+            lines = file.read().splitlines()
+
+        header = {}
+        start = 0
+        for start, line in enumerate(lines, 1):
+            if line.strip() == b"map":
+                break
+            key, value = line.split()
+            header[key] = value
+        w, h = int(header[b"width"]), int(header[b"height"])
+
+        terrain = np.full((h, w), ord("@"), dtype=np.uint8)
+        for y, line in enumerate(lines[start : start + h]):
+            row = np.frombuffer(line[:w], dtype=np.uint8)
+            terrain[y, : len(row)] = row
+        passable = np.isin(terrain, np.frombuffer(MOVINGAI_PASSABLE, dtype=np.uint8))
+        self._reload(w, h, np.ascontiguousarray(~passable[::-1], dtype=np.uint8))
+
+    def save_movingai(self, path: str):
+        w, h = self.size
+        text = np.full((h, w + 1), ord("\n"), dtype=np.uint8)
+        text[:, :w] = np.where(self.obstacles[::-1] != 0, ord("@"), ord("."))
+
+        with open(path, "wb") as file:
+            file.write(f"type octile\nheight {h}\nwidth {w}\nmap\n".encode())
+            file.write(text.data)
+
+
+def _file_magic(path: str) -> bytes:
+    """The first bytes of a file, or nothing if it does not exist yet"""
+
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(BINARY_MAGIC))
+    except FileNotFoundError:
+        return b""
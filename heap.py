@@ -0,0 +1,135 @@
+from typing import Any, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class IndexedHeap(Generic[K]):
+    """A binary min-heap of keys that tracks where every key is stored
+
+    Every key is queued at most once. Keys with equal priority are popped in
+    the order they were pushed.
+    """
+
+    def __init__(self):
+        self.heap: list[list[Any]] = []
+        self.slots: dict[K, int] = {}
+        self.counter = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.slots
+
+    def priority(self, key: K) -> Any:
+        return self.heap[self.slots[key]][0]
+
+    def peek(self) -> tuple[K, Any]:
+        priority, _, key = self.heap[0]
+        return key, priority
+
+    def push(self, key: K, priority: Any):
+        if key in self.slots:
+            raise KeyError(f"{key} is already queued")
+
+        self.heap.append([priority, self.counter, key])
+        self.counter += 1
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self) -> tuple[K, Any]:
+        priority, _, key = self.heap[0]
+        del self.slots[key]
+
+        last = self.heap.pop()
+        if self.heap:
+            self.heap[0] = last
+            self._sift_down(0)
+        return key, priority
+
+    def decrease_key(self, key: K, priority: Any) -> bool:
+        """Lowers the priority of a queued key
+
+        Returns:
+            bool: Whether the priority was lowered
+        """
+
+        slot = self.slots[key]
+        entry = self.heap[slot]
+        if priority >= entry[0]:
+            return False
+
+        entry[0] = priority
+        self._sift_up(slot)
+        return True
+
+    def push_or_decrease(self, key: K, priority: Any) -> bool:
+        """Queues a key, or lowers its priority if it is already queued
+
+        Returns:
+            bool: Whether the key was queued or its priority lowered
+        """
+
+        if key in self.slots:
+            return self.decrease_key(key, priority)
+
+        self.push(key, priority)
+        return True
+
+    def update(self, key: K, priority: Any):
+        """Queues a key, or changes its priority in either direction if it is queued"""
+
+        if key not in self.slots:
+            self.push(key, priority)
+            return
+
+        slot = self.slots[key]
+        entry = self.heap[slot]
+        lowered = priority < entry[0]
+        entry[0] = priority
+        if lowered:
+            self._sift_up(slot)
+        else:
+            self._sift_down(slot)
+
+    def remove(self, key: K):
+        slot = self.slots.pop(key)
+        last = self.heap.pop()
+        if slot == len(self.heap):
+            return
+
+        self.heap[slot] = last
+        self._sift_up(slot)
+        self._sift_down(self.slots[last[2]])
+
+    def _sift_up(self, slot: int):
+        heap = self.heap
+        entry = heap[slot]
+        while slot > 0:
+            parent = (slot - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[slot] = heap[parent]
+            self.slots[heap[slot][2]] = slot
+            slot = parent
+
+        heap[slot] = entry
+        self.slots[entry[2]] = slot
+
+    def _sift_down(self, slot: int):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[slot]
+        while True:
+            child = 2 * slot + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[slot] = heap[child]
+            self.slots[heap[slot][2]] = slot
+            slot = child
+
+        heap[slot] = entry
+        self.slots[entry[2]] = slot
@@ -1,33 +1,126 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from math import sqrt
 
+import numpy as np
+
+SQRT2 = sqrt(2)
+
+
 class HeuristicFunction(ABC):
+    """Estimates the distance from a cell to a target
+
+    When constructed with a grid size, setting a target that was set before
+    builds a table holding the value of every cell, and `calculate` becomes a
+    lookup. A target seen only once is not worth the table, which costs more
+    than most single searches. The most recently used targets are kept with
+    their tables.
+    """
+
+    dest: tuple[int, int]
+
+    def __init__(self, size: tuple[int, int] | None = None, cache_size: int = 4):
+        self.size = size
+        self.width = size[0] if size is not None else 0
+        self.cache_size = cache_size
+        # Targets in order of use, with their tables once they have been reused
+        self.tables: OrderedDict[tuple[int, int], np.ndarray | None] = OrderedDict()
+        self.table: np.ndarray | None = None
+        self.lookup: memoryview | None = None
 
     @abstractmethod
-    def calculate(self, state: tuple[int, int]) -> float: ...
+    def evaluate(self, state: tuple[int, int]) -> float: ...
 
     @abstractmethod
-    def set_target(self, target: tuple[int, int]): ...
+    def evaluate_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray: ...
 
+    def calculate(self, state: tuple[int, int]) -> float:
+        if self.lookup is not None:
+            return self.lookup[state[1] * self.width + state[0]]
+        return self.evaluate(state)
 
-class DistanceHeuristic(HeuristicFunction):
-    dest: tuple[int, int]
+    def calculate_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Scores many cells at once
+
+        Args:
+            xs (np.ndarray): The x coordinates, broadcast against `ys`
+            ys (np.ndarray): The y coordinates, broadcast against `xs`
+
+        Returns:
+            np.ndarray: The value of every cell, in the broadcast shape
+        """
+
+        if self.table is not None:
+            return self.table[ys, xs]
+        return self.evaluate_many(np.asarray(xs), np.asarray(ys))
+
+    def set_target(self, target: tuple[int, int]):
+        self.dest = target
+        self.table = self.lookup = None
+        if self.size is None:
+            return
+
+        seen = target in self.tables
+        table = self.tables.pop(target, None)
+        if table is None and seen:
+            w, h = self.size
+            xs = np.arange(w).reshape(1, w)
+            ys = np.arange(h).reshape(h, 1)
+            table = np.ascontiguousarray(self.evaluate_many(xs, ys), dtype=np.float64)
+
+        self.tables[target] = table
+        while len(self.tables) > self.cache_size:
+            self.tables.popitem(last=False)
 
-    def calculate(self, state: tuple[int, int]) -> float: 
+        if table is not None:
+            self.table = table
+            self.lookup = table.reshape(-1).data
+
+
+class DistanceHeuristic(HeuristicFunction):
+    def evaluate(self, state: tuple[int, int]) -> float:
         dx = state[0] - self.dest[0]
         dy = state[1] - self.dest[1]
         return sqrt(dx * dx + dy * dy)
 
-    def set_target(self, target: tuple[int, int]):
-        self.dest = target
+    def evaluate_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        return np.hypot(xs - self.dest[0], ys - self.dest[1])
 
-class ReverseHeuristic(HeuristicFunction):
-    dest: tuple[int, int]
 
-    def calculate(self, state: tuple[int, int]) -> float: 
+class ReverseHeuristic(HeuristicFunction):
+    def evaluate(self, state: tuple[int, int]) -> float:
         dx = state[0] - self.dest[0]
         dy = state[1] - self.dest[1]
         return -sqrt(dx * dx + dy * dy)
 
-    def set_target(self, target: tuple[int, int]):
-        self.dest = target
\ No newline at end of file
+    def evaluate_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        return -np.hypot(xs - self.dest[0], ys - self.dest[1])
+
+
+class ManhattanHeuristic(HeuristicFunction):
+    def evaluate(self, state: tuple[int, int]) -> float:
+        return abs(state[0] - self.dest[0]) + abs(state[1] - self.dest[1])
+
+    def evaluate_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        distance = np.abs(xs - self.dest[0]) + np.abs(ys - self.dest[1])
+        return distance.astype(np.float64)
+
+
+class OctileHeuristic(HeuristicFunction):
+    def evaluate(self, state: tuple[int, int]) -> float:
+        dx = abs(state[0] - self.dest[0])
+        dy = abs(state[1] - self.dest[1])
+        return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+
+    def evaluate_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        dx = np.abs(xs - self.dest[0])
+        dy = np.abs(ys - self.dest[1])
+        return np.maximum(dx, dy) + (SQRT2 - 1) * np.minimum(dx, dy)
+
+
+HEURISTICS: dict[str, type[HeuristicFunction]] = {
+    "distance": DistanceHeuristic,
+    "reverse": ReverseHeuristic,
+    "manhattan": ManhattanHeuristic,
+    "octile": OctileHeuristic,
+}
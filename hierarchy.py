@@ -0,0 +1,333 @@
+from collections import deque
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from grid import Grid
+
+# Entrances at least this wide get a node at both ends instead of one in the middle
+ENTRANCE_SPLIT = 6
+# Distances are found from this many nodes of every cluster in one pass
+LANES = 32
+ALL_LANES = np.uint32(2**LANES - 1)
+
+
+def entrance_offsets(passable: np.ndarray, period: int) -> np.ndarray:
+    """Picks the entrance cells along a border line
+
+    Args:
+        passable (np.ndarray): Whether the cells on both sides of the border
+            are free, for every cell along the line
+        period (int): The cluster size; entrances never cross into another cluster
+
+    Returns:
+        np.ndarray: The sorted offsets of the entrance cells along the line
+    """
+
+    n = len(passable)
+    offsets = np.arange(n)
+    before = np.zeros(n, dtype=bool)
+    before[1:] = passable[:-1]
+    after = np.zeros(n, dtype=bool)
+    after[:-1] = passable[1:]
+
+    starts = np.flatnonzero(passable & (~before | (offsets % period == 0)))
+    ends = np.flatnonzero(passable & (~after | (offsets % period == period - 1)))
+    width = ends - starts + 1
+    narrow = width < ENTRANCE_SPLIT
+    middles = starts[narrow] + (width[narrow] - 1) // 2
+    return np.sort(np.concatenate([middles, starts[~narrow], ends[~narrow]]))
+
+
+class Hierarchy:
+    """The abstract graph used by HPA* over square clusters of a grid
+
+    Every run of free cell pairs across the border between two clusters is
+    an entrance, marked by one pair of cells in its middle or, for wide
+    entrances, one pair at each end. The marked cells are the nodes of the
+    graph; pairs are joined across the border at a cost of 1, and nodes of
+    the same cluster by their shortest distance without leaving it.
+
+    Building is done with NumPy passes over the whole map. After that, an
+    obstacle edit only rebuilds the cluster it is in, plus a neighbouring
+    cluster when the edit is on the border they share.
+    """
+
+    def __init__(self, grid: "Grid", cluster_size: int = 16):
+        self.grid = grid.root
+        self.cluster_size = cluster_size
+        self.grid.subscribe(self)
+        self.dirty = True
+
+    def obstacles_changed(self, cells: list[int] | None):
+        if cells is None or self.dirty:
+            self.dirty = True
+            return
+
+        for i in cells:
+            self.rebuild_around(i)
+
+    def ensure_built(self):
+        if self.dirty:
+            self.build()
+
+    def build(self):
+        w, h = self.grid.size
+        size = self.cluster_size
+        self.across = -(-w // size)
+        self.down = -(-h // size)
+        free = self.grid.obstacles == 0
+
+        pairs = [np.zeros((2, 0), dtype=np.int64)]
+        for x in range(size, w, size):
+            ys = entrance_offsets(free[:, x - 1] & free[:, x], size)
+            pairs.append(np.stack([ys * w + x - 1, ys * w + x]))
+        for y in range(size, h, size):
+            xs = entrance_offsets(free[y - 1] & free[y], size)
+            pairs.append(np.stack([(y - 1) * w + xs, y * w + xs]))
+        pairs = np.concatenate(pairs, axis=1)
+
+        self.links: dict[int, set[int]] = {}
+        for a, b in pairs.T.tolist():
+            self.links.setdefault(a, set()).add(b)
+            self.links.setdefault(b, set()).add(a)
+
+        cells = np.unique(pairs)
+        clusters = (cells // w // size) * self.across + (cells % w) // size
+        order = np.argsort(clusters, kind="stable")
+        cells, clusters = cells[order], clusters[order]
+        counts = np.bincount(clusters, minlength=self.across * self.down)
+        starts = np.cumsum(counts) - counts
+        slots = np.arange(len(cells)) - starts[clusters]
+        capacity = max(1, int(counts.max(initial=0)))
+
+        self.nodes = np.full((len(counts), capacity), -1, dtype=np.int64)
+        self.nodes[clusters, slots] = cells
+        self.node_counts = counts
+        self.slots = np.full(w * h, -1, dtype=np.int32)
+        self.slots[cells] = slots
+        self.slot_view = self.slots.data
+        self.distances = np.full((len(counts), capacity, capacity), -1, dtype=np.int32)
+
+        # Moves between cells of the same cluster only, as masks for a whole word
+        east = free[:, :-1] & free[:, 1:]
+        east[:, size - 1 :: size] = False
+        north = free[:-1] & free[1:]
+        north[size - 1 :: size] = False
+        east = np.where(east, ALL_LANES, np.uint32(0))
+        north = np.where(north, ALL_LANES, np.uint32(0))
+        for first in range(0, int(counts.max(initial=0)), LANES):
+            self.flood(cells, clusters, slots, first, east, north)
+        self.dirty = False
+
+    def flood(
+        self,
+        cells: np.ndarray,
+        clusters: np.ndarray,
+        slots: np.ndarray,
+        first: int,
+        east: np.ndarray,
+        north: np.ndarray,
+    ):
+        """Finds the distances from up to `LANES` nodes of every cluster at once
+
+        Every cell holds a word with one bit per node it has been reached
+        from, where bit `k` stands for the node in slot `first + k` of the
+        cell's own cluster. Each step grows all of them by one cell.
+        """
+
+        w, h = self.grid.size
+        lanes = slots - first
+        seeded = (lanes >= 0) & (lanes < LANES)
+        frontier = np.zeros(w * h, dtype=np.uint32)
+        frontier[cells[seeded]] = np.left_shift(1, lanes[seeded]).astype(np.uint32)
+        self.distances[clusters[seeded], slots[seeded], slots[seeded]] = 0
+        frontier = frontier.reshape(h, w)
+        seen = frontier.copy()
+        grown = np.empty_like(frontier)
+        moved = np.empty_like(frontier)
+
+        step = 0
+        while True:
+            step += 1
+            grown.fill(0)
+            np.bitwise_and(frontier[:, :-1], east, out=moved[:, 1:])
+            grown[:, 1:] |= moved[:, 1:]
+            np.bitwise_and(frontier[:, 1:], east, out=moved[:, :-1])
+            grown[:, :-1] |= moved[:, :-1]
+            np.bitwise_and(frontier[:-1], north, out=moved[1:])
+            grown[1:] |= moved[1:]
+            np.bitwise_and(frontier[1:], north, out=moved[:-1])
+            grown[:-1] |= moved[:-1]
+            np.bitwise_and(grown, np.invert(seen, out=moved), out=grown)
+            if not grown.any():
+                return
+            seen |= grown
+            frontier, grown = grown, frontier
+
+            arrived = frontier.reshape(-1)[cells]
+            rows = np.flatnonzero(arrived)
+            lanes = np.unpackbits(
+                arrived[rows].astype("<u4").view(np.uint8), bitorder="little"
+            )
+            hit, lane = np.nonzero(lanes.reshape(len(rows), LANES))
+            rows = rows[hit]
+            self.distances[clusters[rows], slots[rows], first + lane] = step
+
+    def cluster_of(self, i: int) -> int:
+        w = self.grid.size[0]
+        return (i // w // self.cluster_size) * self.across + i % w // self.cluster_size
+
+    def bounds(self, cluster: int) -> tuple[int, int, int, int]:
+        """The bottom left corner of a cluster and the corner past its top right"""
+
+        size = self.cluster_size
+        x0 = cluster % self.across * size
+        y0 = cluster // self.across * size
+        w, h = self.grid.size
+        return x0, y0, min(x0 + size, w), min(y0 + size, h)
+
+    def is_node(self, i: int) -> bool:
+        return self.slot_view[i] >= 0
+
+    def neighbors(self, i: int):
+        """The nodes joined to node `i` in the abstract graph, with the cost of each"""
+
+        for j in self.links.get(i, ()):
+            yield j, 1
+
+        slot = self.slot_view[i]
+        if slot < 0:
+            return
+        cluster = self.cluster_of(i)
+        count = self.node_counts[cluster]
+        row = self.distances[cluster, slot, :count].tolist()
+        for j, cost in zip(self.nodes[cluster, :count].tolist(), row):
+            if cost > 0:
+                yield j, cost
+
+    def explore(self, i: int, goal: int | None = None) -> tuple[dict, dict]:
+        """Breadth-first search from cell `i` without leaving its cluster
+
+        Returns:
+            tuple[dict, dict]: The distance to and parent of every cell reached,
+                stopping early once `goal` is reached
+        """
+
+        w = self.grid.size[0]
+        x0, y0, x1, y1 = self.bounds(self.cluster_of(i))
+        blocked = self.grid.obstacle_view
+        distance = {i: 0}
+        parent = {i: -1}
+        queue = deque([i])
+        while queue:
+            i = queue.popleft()
+            if i == goal:
+                break
+            x, y = i % w, i // w
+            step = distance[i] + 1
+            for nx, ny in ((x - 1, y), (x, y + 1), (x + 1, y), (x, y - 1)):
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    j = ny * w + nx
+                    if j not in distance and not blocked[j]:
+                        distance[j] = step
+                        parent[j] = i
+                        queue.append(j)
+        return distance, parent
+
+    def refine(self, route: list[int]) -> list[tuple[int, int]]:
+        """Expands a route of abstract nodes into a path of cells"""
+
+        w = self.grid.size[0]
+        cells = route[:1]
+        for a, b in zip(route, route[1:]):
+            if b in self.links.get(a, ()):
+                cells.append(b)
+                continue
+
+            _, parent = self.explore(a, b)
+            segment = []
+            while b != a:
+                segment.append(b)
+                b = parent[b]
+            cells.extend(reversed(segment))
+        return [(i % w, i // w) for i in cells]
+
+    def rebuild_around(self, i: int):
+        w = self.grid.size[0]
+        cluster = self.cluster_of(i)
+        x0, y0, x1, y1 = self.bounds(cluster)
+        x, y = i % w, i // w
+
+        affected = [cluster]
+        if x == x0 and x0 > 0:
+            self.relink(np.arange(y0, y1) * w + x0 - 1, 1)
+            affected.append(cluster - 1)
+        if x == x1 - 1 and x1 < self.grid.size[0]:
+            self.relink(np.arange(y0, y1) * w + x1 - 1, 1)
+            affected.append(cluster + 1)
+        if y == y0 and y0 > 0:
+            self.relink(np.arange(x0, x1) + (y0 - 1) * w, w)
+            affected.append(cluster - self.across)
+        if y == y1 - 1 and y1 < self.grid.size[1]:
+            self.relink(np.arange(x0, x1) + (y1 - 1) * w, w)
+            affected.append(cluster + self.across)
+
+        for cluster in affected:
+            self.rebuild_nodes(cluster)
+            self.rebuild_distances(cluster)
+
+    def relink(self, near: np.ndarray, step: int):
+        """Finds the entrances again along one border segment
+
+        Args:
+            near (np.ndarray): The cells on the lower side of the border
+            step (int): The flat offset from each cell to the one across the border
+        """
+
+        for a in near.tolist():
+            b = a + step
+            if b in self.links.get(a, ()):
+                self.links[a].discard(b)
+                self.links[b].discard(a)
+
+        obstacles = self.grid.obstacles.reshape(-1)
+        passable = (obstacles[near] == 0) & (obstacles[near + step] == 0)
+        for a in near[entrance_offsets(passable, self.cluster_size)].tolist():
+            self.links.setdefault(a, set()).add(a + step)
+            self.links.setdefault(a + step, set()).add(a)
+
+    def rebuild_nodes(self, cluster: int):
+        w = self.grid.size[0]
+        x0, y0, x1, y1 = self.bounds(cluster)
+        for i in self.nodes[cluster, : self.node_counts[cluster]].tolist():
+            self.slots[i] = -1
+
+        cells = sorted(
+            y * w + x
+            for y in range(y0, y1)
+            for x in range(x0, x1)
+            if (x in (x0, x1 - 1) or y in (y0, y1 - 1)) and self.links.get(y * w + x)
+        )
+        capacity = self.nodes.shape[1]
+        if len(cells) > capacity:
+            grow = len(cells) - capacity
+            self.nodes = np.pad(self.nodes, ((0, 0), (0, grow)), constant_values=-1)
+            self.distances = np.pad(
+                self.distances, ((0, 0), (0, grow), (0, grow)), constant_values=-1
+            )
+
+        self.nodes[cluster] = -1
+        self.nodes[cluster, : len(cells)] = cells
+        self.node_counts[cluster] = len(cells)
+        for slot, i in enumerate(cells):
+            self.slots[i] = slot
+
+    def rebuild_distances(self, cluster: int):
+        cells = self.nodes[cluster, : self.node_counts[cluster]].tolist()
+        self.distances[cluster] = -1
+        for k, i in enumerate(cells):
+            distance, _ = self.explore(i)
+            for j, cell in enumerate(cells):
+                self.distances[cluster, j, k] = distance.get(cell, -1)
@@ -0,0 +1,318 @@
+"""Procedural obstacle layouts for benchmark maps
+
+Every generator takes the map size and a NumPy random generator and returns
+a boolean obstacle array indexed as `[y, x]`, built with whole-array passes
+so maps of 8192x8192 take seconds.
+
+Example: `python mapgen.py caves 4096 4096 --seed 7 --out caves.bmap`
+"""
+
+import argparse
+from itertools import permutations
+from time import perf_counter
+
+import numpy as np
+
+from components import label_components
+from grid import Grid
+
+# Shuffled orders to try the four neighbours of a maze cell in
+_ORDERS = list(permutations(range(4)))
+_STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+# Backtracker mazes are assembled from tiles of this many maze cells a side
+MAZE_TILE = 32
+# Distinct tiles of every shape; each is also used rotated and mirrored
+MAZE_TILE_POOL = 16
+
+
+def random_obstacles(
+    width: int, height: int, rng: np.random.Generator, density: float = 0.2
+) -> np.ndarray:
+    """Blocks every cell independently with probability `density`"""
+
+    return rng.random((height, width)) < density
+
+
+def caves(
+    width: int,
+    height: int,
+    rng: np.random.Generator,
+    fill: float = 0.45,
+    steps: int = 5,
+    connected: bool = True,
+) -> np.ndarray:
+    """Cellular-automaton caves
+
+    The map starts as random noise, then every step turns a cell into rock
+    when at least five of the nine cells around and including it are rock.
+    The map's edge counts as rock.
+
+    Args:
+        fill (float, optional): The share of rock in the noise. Defaults to 0.45.
+        steps (int, optional): Smoothing steps. Defaults to 5.
+        connected (bool, optional): Whether to fill every cave but the largest,
+            so any two free cells are joined. Defaults to True.
+    """
+
+    rock = rng.random((height, width)) < fill
+    padded = np.ones((height + 2, width + 2), dtype=np.uint8)
+    rows = np.empty((height + 2, width), dtype=np.uint8)
+    count = np.empty((height, width), dtype=np.uint8)
+    for _ in range(steps):
+        padded[1:-1, 1:-1] = rock
+        # Sums of three across, then sums of three of those down
+        np.add(padded[:, :-2], padded[:, 1:-1], out=rows)
+        rows += padded[:, 2:]
+        np.add(rows[:-2], rows[1:-1], out=count)
+        count += rows[2:]
+        rock = count >= 5
+
+    if connected:
+        rock = _keep_largest(rock)
+    return rock
+
+
+def _keep_largest(obstacles: np.ndarray) -> np.ndarray:
+    labels, count = label_components(obstacles.view(np.uint8))
+    sizes = np.bincount(labels.ravel(), minlength=count)
+    sizes[0] = 0
+    if not sizes.any():
+        return obstacles
+    return labels != sizes.argmax()
+
+
+def _maze_size(width: int, height: int) -> tuple[int, int]:
+    """The maze cells that fit, with cell `(x, y)` at `(2x + 1, 2y + 1)`"""
+
+    if width < 3 or height < 3:
+        raise ValueError("Mazes need a map of at least 3x3")
+    return (width - 1) // 2, (height - 1) // 2
+
+
+def _backtracker(columns: int, rows: int, rng: np.random.Generator) -> np.ndarray:
+    """A depth-first maze of `columns` by `rows` cells, with walls around it"""
+
+    cells = columns * rows
+    walls = np.ones((2 * rows + 1, 2 * columns + 1), dtype=bool)
+    walls[1::2, 1::2] = False
+    orders = rng.integers(len(_ORDERS), size=cells).tolist()
+    tried = bytearray(cells)
+    visited = bytearray(cells)
+
+    start = int(rng.integers(cells))
+    visited[start] = 1
+    stack = [start]
+    while stack:
+        i = stack[-1]
+        if tried[i] == 4:
+            stack.pop()
+            continue
+
+        dx, dy = _STEPS[_ORDERS[orders[i]][tried[i]]]
+        tried[i] += 1
+        x, y = i % columns + dx, i // columns + dy
+        j = y * columns + x
+        if 0 <= x < columns and 0 <= y < rows and not visited[j]:
+            visited[j] = 1
+            walls[2 * y + 1 - dy, 2 * x + 1 - dx] = False
+            stack.append(j)
+    return walls
+
+
+def backtracker_maze(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """A perfect maze of long winding corridors, grown depth first
+
+    A depth-first search is sequential, so the maze is built from a pool of
+    small tiles, each a depth-first maze, placed rotated and mirrored at
+    random. The tiles are joined through one opening along every edge of a
+    depth-first maze of tiles, which keeps exactly one route between any
+    two cells.
+    """
+
+    columns, rows = _maze_size(width, height)
+    across, down = -(-columns // MAZE_TILE), -(-rows // MAZE_TILE)
+    pools: dict[tuple[int, int], list[np.ndarray]] = {}
+
+    def tile(w: int, h: int) -> np.ndarray:
+        if (w, h) not in pools:
+            pool = []
+            for _ in range(MAZE_TILE_POOL):
+                walls = _backtracker(w, h, rng)
+                pool += [walls, walls[::-1], walls[:, ::-1], walls[::-1, ::-1]]
+                if w == h:
+                    pool += [np.rot90(walls) for walls in pool[-4:]]
+            pools[w, h] = pool
+        pool = pools[w, h]
+        return pool[rng.integers(len(pool))]
+
+    obstacles = np.ones((height, width), dtype=bool)
+    for ty in range(down):
+        h = min(MAZE_TILE, rows - ty * MAZE_TILE)
+        for tx in range(across):
+            w = min(MAZE_TILE, columns - tx * MAZE_TILE)
+            x0, y0 = 2 * tx * MAZE_TILE, 2 * ty * MAZE_TILE
+            obstacles[y0 : y0 + 2 * h + 1, x0 : x0 + 2 * w + 1] = tile(w, h)
+
+    # Open one wall between the tiles joined in the maze of tiles
+    links = _backtracker(across, down, rng)
+    ys, xs = np.nonzero(~links[1:-1:2, 2:-1:2])
+    offsets = rng.integers(MAZE_TILE, size=len(xs))
+    offsets %= np.minimum(MAZE_TILE, rows - ys * MAZE_TILE)
+    obstacles[2 * (ys * MAZE_TILE + offsets) + 1, 2 * (xs + 1) * MAZE_TILE] = False
+    ys, xs = np.nonzero(~links[2:-1:2, 1:-1:2])
+    offsets = rng.integers(MAZE_TILE, size=len(xs))
+    offsets %= np.minimum(MAZE_TILE, columns - xs * MAZE_TILE)
+    obstacles[2 * (ys + 1) * MAZE_TILE, 2 * (xs * MAZE_TILE + offsets) + 1] = False
+    return obstacles
+
+
+def division_maze(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """A perfect maze of long straight walls, made by recursive division
+
+    Every chamber is split by a wall with one gap in it, across its longer
+    side, until chambers are one cell wide. All chambers of the same depth
+    are split together.
+    """
+
+    columns, rows = _maze_size(width, height)
+    obstacles = np.zeros((height, width), dtype=bool)
+    obstacles[: 2 * rows + 1 : 2 * rows, : 2 * columns + 1] = True
+    obstacles[: 2 * rows + 1, : 2 * columns + 1 : 2 * columns] = True
+    obstacles[2 * rows + 1 :] = True
+    obstacles[:, 2 * columns + 1 :] = True
+    flat = obstacles.reshape(-1)
+
+    # Chambers in maze cells, from x0 and y0 up to but excluding x1 and y1
+    x0, y0 = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    x1, y1 = np.full(1, columns, dtype=np.int64), np.full(1, rows, dtype=np.int64)
+    while len(x0):
+        w, h = x1 - x0, y1 - y0
+        keep = (w > 1) & (h > 1)
+        x0, y0, x1, y1, w, h = x0[keep], y0[keep], x1[keep], y1[keep], w[keep], h[keep]
+        across = (h > w) | ((h == w) & (rng.random(len(w)) < 0.5))
+
+        # Walls go between two rows or columns of cells, with a gap on a cell
+        split = np.where(across, y0 + rng.integers(h - 1), x0 + rng.integers(w - 1))
+        gap = np.where(across, x0 + rng.integers(w), y0 + rng.integers(h))
+        start = np.where(
+            across, 2 * (split + 1) * width + 2 * x0, (2 * y0) * width + 2 * (split + 1)
+        )
+        length = np.where(across, 2 * w + 1, 2 * h + 1)
+        stride = np.where(across, 1, width)
+        first = np.repeat(np.cumsum(length) - length, length)
+        offsets = np.arange(length.sum()) - first
+        flat[np.repeat(start, length) + offsets * np.repeat(stride, length)] = True
+        gap_offset = np.where(across, 2 * (gap - x0) + 1, 2 * (gap - y0) + 1)
+        flat[start + gap_offset * stride] = False
+
+        x0, y0, x1, y1 = (
+            np.concatenate([x0, np.where(across, x0, split + 1)]),
+            np.concatenate([y0, np.where(across, split + 1, y0)]),
+            np.concatenate([np.where(across, x1, split + 1), x1]),
+            np.concatenate([np.where(across, split + 1, y1), y1]),
+        )
+    return obstacles
+
+
+def rooms(
+    width: int,
+    height: int,
+    rng: np.random.Generator,
+    spacing: int = 24,
+    loops: float = 0.1,
+) -> np.ndarray:
+    """Rectangular rooms joined by corridors
+
+    The map is divided into squares of `spacing` cells, each holding one room
+    of random size. Neighbouring rooms are joined by L-shaped corridors along
+    a depth-first maze over the squares, plus a share `loops` of the
+    remaining neighbours so there is more than one way around.
+    """
+
+    if width < spacing or height < spacing:
+        raise ValueError(f"Rooms need a map of at least {spacing}x{spacing}")
+    across, down = width // spacing, height // spacing
+    count = across * down
+    low = max(3, spacing // 3)
+    room_w = rng.integers(low, spacing - 1, size=count)
+    room_h = rng.integers(low, spacing - 1, size=count)
+    left = rng.integers(1, spacing - room_w)
+    bottom = rng.integers(1, spacing - room_h)
+
+    ys, xs = np.ogrid[: down * spacing, : across * spacing]
+    square = ys // spacing * across + xs // spacing
+    lx, ly = xs % spacing, ys % spacing
+    free = np.zeros((height, width), dtype=bool)
+    free[: down * spacing, : across * spacing] = (
+        (lx >= left[square])
+        & (lx < (left + room_w)[square])
+        & (ly >= bottom[square])
+        & (ly < (bottom + room_h)[square])
+    )
+
+    links = _backtracker(across, down, rng)
+    east = ~links[1:-1:2, 2:-1:2] | (rng.random((down, across - 1)) < loops)
+    north = ~links[2:-1:2, 1:-1:2] | (rng.random((down - 1, across)) < loops)
+    cx = (np.arange(count) % across) * spacing + left + room_w // 2
+    cy = (np.arange(count) // across) * spacing + bottom + room_h // 2
+    ey, ex = np.nonzero(east)
+    ny, nx = np.nonzero(north)
+    a = np.concatenate([ey * across + ex, ny * across + nx])
+    b = np.concatenate([ey * across + ex + 1, (ny + 1) * across + nx])
+    corridors = zip(cx[a].tolist(), cy[a].tolist(), cx[b].tolist(), cy[b].tolist())
+    for ax, ay, bx, by in corridors:
+        free[ay, min(ax, bx) : max(ax, bx) + 1] = True
+        free[min(ay, by) : max(ay, by) + 1, bx] = True
+    return ~free
+
+
+GENERATORS = {
+    "random": random_obstacles,
+    "caves": caves,
+    "backtracker": backtracker_maze,
+    "division": division_maze,
+    "rooms": rooms,
+}
+
+
+def generate(name: str, width: int, height: int, seed: int = 0, **options) -> Grid:
+    """Builds a grid with one of the `GENERATORS`"""
+
+    rng = np.random.default_rng(seed)
+    obstacles = GENERATORS[name](width, height, rng, **options)
+    return Grid.from_obstacles(np.ascontiguousarray(obstacles, dtype=np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("generator", choices=GENERATORS)
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, help="for random maps")
+    parser.add_argument("--out", required=True, help="a .bmap, .map or MovingAI file")
+    parser.add_argument(
+        "--movingai", action="store_true", help="write the MovingAI map format"
+    )
+    args = parser.parse_args()
+    if args.density is not None and args.generator != "random":
+        parser.error("--density only applies to random maps")
+
+    options = {} if args.density is None else {"density": args.density}
+    start = perf_counter()
+    grid = generate(args.generator, args.width, args.height, args.seed, **options)
+    elapsed = perf_counter() - start
+    if args.movingai:
+        grid.save_movingai(args.out)
+    else:
+        grid.save_to_file(args.out)
+
+    blocked = int(np.count_nonzero(grid.obstacles))
+    print(
+        f"{args.width}x{args.height} {args.generator}: {elapsed:.2f} s, "
+        f"{blocked / grid.obstacles.size:.0%} blocked"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Counters kept by every search, and an opt-in profiler for the window's frames
+
+Every `SearchAlgorithm` keeps a `SearchMetrics` in its `metrics`, reset by
+`start_search`. The algorithms count their own frontier and heuristic work,
+and `run` adds the steps, the time spent and the peak frontier size. Metrics
+of many searches can be written to a JSON or CSV file with `save_metrics`.
+"""
+
+import csv
+import json
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from time import perf_counter
+
+# Frames the frame profiler averages over
+PROFILE_FRAMES = 120
+
+
+@dataclass
+class SearchMetrics:
+    """What a search has done since it started
+
+    Attributes:
+        expansions (int): Cells whose neighbours were generated
+        pushes (int): Cells added to the frontier
+        pops (int): Cells taken off the frontier
+        duplicates (int): Pushes of cells already on the frontier, which
+            update them in place
+        peak_frontier (int): The largest frontier seen between steps
+        heuristic_evaluations (int): Heuristic values looked up
+        neighbor_calls (int): Calls that generate the neighbours of a cell
+        steps (int): Steps taken by `run`
+        time (float): Seconds spent in `run`
+    """
+
+    expansions: int = 0
+    pushes: int = 0
+    pops: int = 0
+    duplicates: int = 0
+    peak_frontier: int = 0
+    heuristic_evaluations: int = 0
+    neighbor_calls: int = 0
+    steps: int = 0
+    time: float = 0.0
+
+    @property
+    def step_time(self) -> float:
+        """The mean seconds per step"""
+
+        return self.time / self.steps if self.steps else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "step_time": self.step_time}
+
+    def summary(self) -> str:
+        return (
+            f"{self.expansions} expanded, peak frontier {self.peak_frontier}, "
+            f"{self.step_time * 1e6:.1f} us/step"
+        )
+
+
+FIELDS = list(SearchMetrics().as_dict())
+
+
+def save_metrics(path: str, rows: list[dict]):
+    """Writes rows of metrics, as CSV if `path` ends in `.csv` and JSON otherwise
+
+    Args:
+        path (str): The file to write
+        rows (list[dict]): One row per search, each the fields of
+            `SearchMetrics.as_dict` plus any fields describing the search
+    """
+
+    if path.endswith(".csv"):
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as file:
+            json.dump(rows, file, indent=2)
+
+
+class FrameProfiler:
+    """Times named parts of the window's frames over the last `frames` frames"""
+
+    def __init__(self, frames: int = PROFILE_FRAMES):
+        self.times: defaultdict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=frames)
+        )
+
+    @contextmanager
+    def measure(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name].append(perf_counter() - start)
+
+    def summary(self) -> str:
+        """The mean and worst milliseconds of every part"""
+
+        return ", ".join(
+            f"{name} {sum(times) / len(times) * 1e3:.1f} ms "
+            f"(max {max(times) * 1e3:.1f})"
+            for name, times in self.times.items()
+            if times
+        )
@@ -0,0 +1,294 @@
+"""Runs the queries of MovingAI scenario files and checks the path lengths
+
+Each `.scen` file lists queries over a benchmark map with the length of an
+optimal path between them, using 8-way moves at a cost of sqrt(2) for
+diagonals without cutting corners. Every query is run with the chosen
+algorithm, and the cost of its path is compared with that length. Latency
+percentiles, expansions and throughput are reported per scenario file.
+With `--cache`, queries run before on the same map are answered from a file.
+
+Example: `python movingai.py scen/*.scen --maps maps -a astar`
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Sequence
+
+import numpy as np
+
+from cache import QueryCache
+from grid import DIAGONAL_COST, Grid
+from heuristic import HEURISTICS
+from search import ALGORITHMS, create_algorithm
+
+SCENARIO_VERSION = "version 1"
+# Optimal lengths are listed with eight decimals
+LENGTH_TOLERANCE = 1e-4
+# Results that mean a search is broken rather than just not optimal
+FAILURES = ("shorter", "not found")
+
+FIELDS = [
+    "scenario",
+    "map",
+    "bucket",
+    "src_x",
+    "src_y",
+    "dest_x",
+    "dest_y",
+    "optimal",
+    "cost",
+    "status",
+    "expansions",
+    "cached",
+    "setup",
+    "latency",
+]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """One query of a scenario file, in MovingAI coordinates with y going down"""
+
+    bucket: int
+    map: str
+    size: tuple[int, int]
+    src: tuple[int, int]
+    dest: tuple[int, int]
+    optimal: float
+
+
+def load_scenarios(path: str) -> list[Scenario]:
+    with open(path) as file:
+        version, *lines = file.read().splitlines()
+    if version.strip() != SCENARIO_VERSION:
+        raise ValueError(f"{path} is not a {SCENARIO_VERSION} scenario file")
+
+    scenarios = []
+    for line in lines:
+        if not line.strip():
+            continue
+        bucket, name, w, h, sx, sy, dx, dy, optimal = line.split("\t")
+        scenarios.append(
+            Scenario(
+                int(bucket),
+                name,
+                (int(w), int(h)),
+                (int(sx), int(sy)),
+                (int(dx), int(dy)),
+                float(optimal),
+            )
+        )
+    return scenarios
+
+
+def find_map(name: str, scenario_path: str, maps: str | None) -> str:
+    """Finds the map a scenario refers to, next to the scenario file by default"""
+
+    folder = maps if maps is not None else os.path.dirname(scenario_path)
+    for candidate in (name, os.path.basename(name)):
+        path = os.path.join(folder, candidate)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"Map {name} of {scenario_path} not found in {folder}")
+
+
+def to_grid(pos: tuple[int, int], height: int) -> tuple[int, int]:
+    """Turns MovingAI coordinates into grid ones, where y goes up"""
+
+    return pos[0], height - 1 - pos[1]
+
+
+def path_cost(path: Sequence[tuple[int, int]]) -> float:
+    cost = 0.0
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        cost += DIAGONAL_COST if x0 != x1 and y0 != y1 else 1
+    return cost
+
+
+def check(cost: float, optimal: float) -> str:
+    if math.isclose(cost, optimal, abs_tol=LENGTH_TOLERANCE):
+        return "optimal"
+    return "longer" if cost > optimal else "shorter"
+
+
+def prepare(grid: Grid) -> float:
+    """Builds the component labels and move masks every query on a map uses
+
+    Returns:
+        float: The seconds it took
+    """
+
+    start = perf_counter()
+    grid.components.component(0, 0)
+    len(grid.moves)
+    return perf_counter() - start
+
+
+def run_scenarios(
+    grid: Grid,
+    scenarios: list[Scenario],
+    algorithm: str,
+    heuristic: str,
+    weight: float = 2.0,
+    diagonal: bool = True,
+    cache: QueryCache | None = None,
+) -> list[dict]:
+    """Runs every query on one map, reusing the same search for all of them
+
+    Path lengths are only checked with diagonal moves, which the optimal
+    lengths assume, and for algorithms that track a path. Queries found in
+    `cache` are not run again.
+
+    A query's `setup` is the time spent aiming the heuristic and clearing the
+    search's state, and its `latency` the time spent searching. The map is
+    prepared first, so neither includes the one-off work of `prepare`.
+    """
+
+    prepare(grid)
+
+    h = HEURISTICS[heuristic](grid.size)
+    algo = create_algorithm(algorithm, grid, h, weight, diagonal)
+    spec = (algorithm, heuristic, weight, diagonal)
+    height = grid.size[1]
+
+    results = []
+    for scenario in scenarios:
+        if scenario.size != grid.size:
+            raise ValueError(f"{scenario.map} is not {scenario.size} as listed")
+        src, dest = to_grid(scenario.src, height), to_grid(scenario.dest, height)
+        setup = 0.0
+        start = perf_counter()
+        result = cache.get(grid, spec, src, dest) if cache is not None else None
+        cached = result is not None
+        if result is None:
+            h.set_target(dest)
+            algo.start_search(src, dest)
+            setup = perf_counter() - start
+            start = perf_counter()
+            algo.run()
+            if cache is not None:
+                result = cache.put(grid, spec, src, dest, algo)
+        latency = perf_counter() - start
+
+        found = result.found if result else algo.dest_found()
+        metrics = result.metrics if result else algo.metrics
+        path = (result.path if result else algo.path()) if found else None
+        cost = path_cost(path) if path else None
+        if not found:
+            status = "not found"
+        elif cost is None or not diagonal:
+            status = "unchecked"
+        else:
+            status = check(cost, scenario.optimal)
+        results.append(
+            {
+                "map": scenario.map,
+                "bucket": scenario.bucket,
+                "src_x": scenario.src[0],
+                "src_y": scenario.src[1],
+                "dest_x": scenario.dest[0],
+                "dest_y": scenario.dest[1],
+                "optimal": scenario.optimal,
+                "cost": cost,
+                "status": status,
+                "expansions": metrics.expansions,
+                "cached": cached,
+                "setup": setup,
+                "latency": latency,
+            }
+        )
+    return results
+
+
+def report(name: str, results: list[dict]):
+    latencies = np.array([result["latency"] for result in results])
+    setups = np.array([result["setup"] for result in results])
+    expansions = np.array([result["expansions"] for result in results])
+    statuses = [result["status"] for result in results]
+    counts = {status: statuses.count(status) for status in dict.fromkeys(statuses)}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+    total = latencies.sum()
+
+    cached = sum(result["cached"] for result in results)
+    print(f"{name}: {len(results)} queries" + (f", {cached} cached" if cached else ""))
+    print("  paths: " + ", ".join(f"{n} {status}" for status, n in counts.items()))
+    print(f"  expansions: mean {expansions.mean():,.0f}, max {expansions.max():,}")
+    print(f"  latency: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms")
+    print(
+        f"  setup: mean {setups.mean() * 1e3:.2f} ms, "
+        f"max {setups.max() * 1e3:.2f} ms"
+    )
+    print(
+        f"  throughput: {len(results) / total:,.1f} queries/s, "
+        f"{expansions.sum() / total:,.0f} expansions/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scenarios", nargs="+", help="MovingAI .scen files")
+    parser.add_argument("--maps", help="folder of the maps; by default the .scen's")
+    parser.add_argument("-a", "--algorithm", choices=ALGORITHMS, default="astar")
+    parser.add_argument("--heuristic", choices=list(HEURISTICS), default="octile")
+    parser.add_argument("--weight", type=float, default=2.0, help="for weighted-astar")
+    parser.add_argument(
+        "--four-way",
+        action="store_true",
+        help="only move orthogonally; the optimal lengths then no longer apply",
+    )
+    parser.add_argument("--limit", type=int, help="queries to run from each file")
+    parser.add_argument("--csv", help="write every query's result to this file")
+    parser.add_argument("--cache", help="a file of earlier results to reuse and add to")
+    args = parser.parse_args()
+    cache = QueryCache(path=args.cache) if args.cache else None
+
+    rows = []
+    failed = 0
+    grids: dict[str, Grid] = {}
+    for scenario_path in args.scenarios:
+        scenarios = load_scenarios(scenario_path)[: args.limit]
+        by_map: dict[str, list[Scenario]] = {}
+        for scenario in scenarios:
+            by_map.setdefault(scenario.map, []).append(scenario)
+
+        results = []
+        for name, queries in by_map.items():
+            path = find_map(name, scenario_path, args.maps)
+            if path not in grids:
+                start = perf_counter()
+                grid = grids[path] = Grid(0, 0)
+                grid.load_from_file(path)
+                loaded = perf_counter() - start
+                prepared = prepare(grid)
+                print(f"{path}: loaded in {loaded:.2f} s, prepared in {prepared:.2f} s")
+            results += run_scenarios(
+                grids[path],
+                queries,
+                args.algorithm,
+                args.heuristic,
+                args.weight,
+                not args.four_way,
+                cache,
+            )
+
+        report(scenario_path, results)
+        failed += sum(result["status"] in FAILURES for result in results)
+        rows += [{"scenario": scenario_path, **result} for result in results]
+
+    if cache is not None:
+        cache.save()
+    if args.csv:
+        with open(args.csv, "w", newline="") as file:
+            writer = csv.DictWriter(file, FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
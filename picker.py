@@ -1,7 +1,7 @@
 from enum import Enum
 from pyglet import shapes
 
-from render import GridRenderer
+from render import GridRenderer, TextureRenderer
 
 
 class PickState(Enum):
@@ -15,7 +15,7 @@ class CellPicker:
 
     def __init__(
         self,
-        renderer: GridRenderer,
+        renderer: GridRenderer | TextureRenderer,
         tint: tuple[int, int, int] = (255, 255, 255),
     ):
 
@@ -39,9 +39,14 @@ class CellPicker:
 
     def __set_cell(self, x: int, y: int):
         self.selected = x, y
-        x, y = self.renderer.get_cell_position(x, y)
+        self.__place()
+
+    def __place(self):
+        assert self.selected
+        x, y = self.renderer.get_cell_position(*self.selected)
         self.rect.x = x
         self.rect.y = y
+        self.rect.width = self.rect.height = self.renderer.cell_size
 
     def pick(self):
         if self.state != PickState.PICKING:
@@ -55,6 +60,7 @@ class CellPicker:
 
     def draw(self):
         if self.state != PickState.INVALID:
+            self.__place()
             self.rect.draw()
 
     @property
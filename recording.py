@@ -0,0 +1,223 @@
+"""Recording and replaying the cell changes made by a search
+
+A trace holds every change a search made to its overlay as one `uint32` per
+event, with the flat cell index in the upper bits and the event kind in the
+lowest three. A compressed snapshot of the whole overlay is taken whenever
+enough events have piled up since the last one, so seeking only replays the
+events after the closest snapshot before the target step, and snapshots
+never take more room than the events themselves.
+"""
+
+from array import array
+from bisect import bisect_right
+import json
+import struct
+import zlib
+
+import numpy as np
+
+from grid import Grid
+from search import SearchAlgorithm
+
+TRACE_MAGIC = b"SVTR"
+TRACE_VERSION = 1
+# Magic, version, width, height, snapshot count and the byte lengths of the
+# metadata, events and step offsets that follow
+TRACE_HEADER = struct.Struct("<4sBxxxIIIIII")
+# Step, event offset and byte length of one compressed snapshot
+SNAPSHOT_HEADER = struct.Struct("<IQI")
+
+# Event kinds 0 to 2 set a cell to that state code
+EVENT_OBSTACLE = 3
+EVENT_FOUND = 4
+EVENT_BITS = 3
+EVENT_KINDS = (1 << EVENT_BITS) - 1
+MAX_CELLS = 1 << (32 - EVENT_BITS)
+
+
+def apply_events(grid: Grid, events: np.ndarray, obstacles: bool = True) -> bool:
+    """Applies a run of events to a grid in order
+
+    Args:
+        grid (Grid): The grid to change
+        events (np.ndarray): The `uint32` events
+        obstacles (bool, optional): Whether to toggle obstacles, or to skip
+            the toggles of a grid that already follows the obstacles on its
+            own. Defaults to True.
+
+    Returns:
+        bool: Whether a found event was among them
+    """
+
+    kinds = events & EVENT_KINDS
+    cells = (events >> EVENT_BITS).astype(np.int64)
+    marks = kinds < EVENT_OBSTACLE
+    # The marks between two toggles are applied together, as the obstacles
+    # stay put in between
+    toggles = np.flatnonzero(kinds == EVENT_OBSTACLE).tolist() if obstacles else []
+
+    w = grid.size[0]
+    start = 0
+    for end in toggles + [len(events)]:
+        keep = marks[start:end]
+        grid.mark_cells(cells[start:end][keep], kinds[start:end][keep])
+        if end < len(events):
+            i = int(cells[end])
+            grid.toggle_obstacle(i % w, i // w)
+        start = end + 1
+    return bool(np.any(kinds == EVENT_FOUND))
+
+
+class TraceRecorder:
+    """Records the events of a search as it runs
+
+    The recorder hooks into the search's overlay and `SearchAlgorithm.run`,
+    so it should be created right after `start_search`.
+    """
+
+    def __init__(self, algo: SearchAlgorithm, snapshot_events: int = 4096):
+        w, h = algo.grid.size
+        if w * h > MAX_CELLS:
+            raise ValueError(f"Traces hold at most {MAX_CELLS} cells")
+
+        self.algo = algo
+        # A snapshot costs about a quarter byte per cell once compressed
+        self.snapshot_events = max(snapshot_events, w * h // 4)
+        self.events = array("I")
+        self.steps = array("Q")
+        self.snapshots: list[tuple[int, int, bytes]] = []
+        self.snapshot()
+
+        algo.grid.journal = self.events
+        algo.trace = self
+
+    def snapshot(self):
+        grid = self.algo.grid
+        planes = grid.states.tobytes() + np.packbits(grid.obstacles != 0).tobytes()
+        planes = zlib.compress(planes, 1)
+        self.snapshots.append((len(self.steps), len(self.events), planes))
+
+    def step(self):
+        """Marks the start of a step; called by `SearchAlgorithm.run`"""
+
+        if len(self.events) - self.snapshots[-1][1] >= self.snapshot_events:
+            self.snapshot()
+        self.steps.append(len(self.events))
+
+    def finish(self):
+        """Stops recording, adding a found event if the search succeeded"""
+
+        algo = self.algo
+        if algo.dest_found():
+            dest = algo.dest
+            assert dest is not None
+            i = dest[1] * algo.grid.size[0] + dest[0]
+            self.events.append(i << EVENT_BITS | EVENT_FOUND)
+        algo.grid.journal = None
+        algo.trace = None
+
+    def save(self, path: str):
+        algo = self.algo
+        path_cells = algo.path()
+        metadata = json.dumps(
+            {
+                "algorithm": str(algo),
+                "src": algo.src,
+                "dest": algo.dest,
+                "found": algo.dest_found(),
+                "path": path_cells,
+            }
+        ).encode()
+        events = zlib.compress(np.frombuffer(self.events, np.uint32).astype("<u4").data)
+        steps = zlib.compress(np.frombuffer(self.steps, np.uint64).astype("<u8").data)
+
+        w, h = algo.grid.size
+        with open(path, "wb") as file:
+            file.write(
+                TRACE_HEADER.pack(
+                    TRACE_MAGIC,
+                    TRACE_VERSION,
+                    w,
+                    h,
+                    len(self.snapshots),
+                    len(metadata),
+                    len(events),
+                    len(steps),
+                )
+            )
+            file.write(metadata)
+            file.write(events)
+            file.write(steps)
+            for step, offset, planes in self.snapshots:
+                file.write(SNAPSHOT_HEADER.pack(step, offset, len(planes)))
+                file.write(planes)
+
+
+class TraceReplay:
+    """Plays a saved trace back on a grid of its own, seeking to any step"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        magic, version, w, h, count, *lengths = TRACE_HEADER.unpack_from(data)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} trace")
+
+        offset = TRACE_HEADER.size
+        chunks = []
+        for length in lengths:
+            chunks.append(data[offset : offset + length])
+            offset += length
+        metadata, events, steps = chunks
+        self.metadata = json.loads(metadata)
+        self.events = np.frombuffer(zlib.decompress(events), "<u4").astype(np.uint32)
+        self.steps = np.frombuffer(zlib.decompress(steps), "<u8").tolist()
+
+        self.snapshots: list[tuple[int, int, bytes]] = []
+        for _ in range(count):
+            step, event, length = SNAPSHOT_HEADER.unpack_from(data, offset)
+            offset += SNAPSHOT_HEADER.size
+            self.snapshots.append((step, event, data[offset : offset + length]))
+            offset += length
+        self.snapshot_steps = [step for step, _, _ in self.snapshots]
+
+        self.grid = Grid(w, h)
+        self.found = False
+        self.restore(0)
+
+    def __len__(self) -> int:
+        """The number of steps in the trace"""
+
+        return len(self.steps)
+
+    def restore(self, index: int):
+        step, event, planes = self.snapshots[index]
+        planes = zlib.decompress(planes)
+        w, h = self.grid.size
+        states = np.frombuffer(planes, np.uint8, w * h).reshape(h, w)
+        obstacles = np.unpackbits(np.frombuffer(planes, np.uint8, offset=w * h))
+        self.grid.states[:] = states
+        self.grid.obstacles[:] = obstacles[: w * h].reshape(h, w)
+        self.grid._recount()
+        self.grid.all_changed = True
+        self.position = step
+        self.event = event
+        self.found = False
+
+    def event_offset(self, step: int) -> int:
+        return self.steps[step] if step < len(self.steps) else len(self.events)
+
+    def seek(self, step: int):
+        """Shows the grid as it was after `step` steps"""
+
+        step = max(0, min(step, len(self.steps)))
+        index = bisect_right(self.snapshot_steps, step) - 1
+        if step < self.position or self.snapshots[index][0] > self.position:
+            self.restore(index)
+
+        end = self.event_offset(step)
+        if apply_events(self.grid, self.events[self.event : end]):
+            self.found = True
+        self.position = step
+        self.event = end
@@ -1,28 +1,35 @@
-from grid import Grid
+import math
 
-from pyglet import graphics, shapes
+import numpy as np
+
+from grid import PALETTE, CellState, Grid
+
+from pyglet import gl, graphics, image, shapes
 
 
 class GridRenderer:
     def __init__(
         self, g: Grid, cell_size: int, off: tuple[int, int] = (0, 0), gap: int = 0
     ):
-        self.grid = g
+        self.show(g)
         self.offset = off
         self.cell_size = cell_size
         self.gap = gap
 
+        self.colors = [(*color, 255) for color in PALETTE.tolist()]
+
+        w, h = g.size
         self.batch = graphics.Batch()
         self.cells = [
             shapes.Rectangle(
-                x=off[0] + self.total_cell_size * cell.pos[0],
-                y=off[1] + self.total_cell_size * cell.pos[1],
+                x=off[0] + self.total_cell_size * (i % w),
+                y=off[1] + self.total_cell_size * (i // w),
                 width=cell_size,
                 height=cell_size,
-                color=(*cell.state.value, 255),
+                color=self.colors[code],
                 batch=self.batch,
             )
-            for cell in g.cells
+            for i, code in enumerate(g.codes().ravel().tolist())
         ]
 
     @property
@@ -43,9 +50,22 @@ class GridRenderer:
     def total_cell_size(self) -> int:
         return self.cell_size + self.gap
 
+    def show(self, g: Grid):
+        """Draws another grid of the same size from now on, such as a search overlay"""
+
+        self.grid = g
+        g.track_changes = True
+        g.all_changed = True
+
     def update(self):
-        for i, cell in enumerate(self.grid.cells):
-            self.cells[i].color = (*cell.state.value, 255)
+        changes = self.grid.flush_changes()
+        if changes is None:
+            for rect, code in zip(self.cells, self.grid.codes().ravel().tolist()):
+                rect.color = self.colors[code]
+            return
+
+        for i in changes:
+            self.cells[i].color = self.colors[self.grid.code_at(i)]
 
     def draw(self):
         self.batch.draw()
@@ -67,3 +87,140 @@ class GridRenderer:
             return None
 
         return x, y
+
+
+class TextureRenderer:
+    """Draws the grid as a single texture with one pixel per cell
+
+    The camera can be panned and zoomed; only the part of the texture inside
+    the viewport is drawn. Changed cells are uploaded in square tiles.
+    """
+
+    TILE = 64
+    MIN_SCALE = 1 / 8
+    MAX_SCALE = 64
+
+    def __init__(
+        self,
+        g: Grid,
+        cell_size: float,
+        off: tuple[int, int] = (0, 0),
+        viewport: tuple[int, int] | None = None,
+    ):
+        self.show(g)
+        self.offset = off
+        self.scale = cell_size
+        self.origin = off
+        w, h = g.size
+        self.viewport = viewport or (round(w * cell_size), round(h * cell_size))
+
+        self.palette = np.hstack(
+            [PALETTE, np.full((len(PALETTE), 1), 255, dtype=np.uint8)]
+        )
+        self.texture = image.Texture.create(
+            w, h, min_filter=gl.GL_NEAREST, mag_filter=gl.GL_NEAREST
+        )
+
+    @property
+    def bounding_box(self) -> tuple[int, int, int, int]:
+        """Calculates the bounding box of the viewport
+
+        Returns:
+            tuple[int, int, int, int]: The bottom left and size of the rectangle
+        """
+
+        return (*self.offset, *self.viewport)
+
+    @property
+    def cell_size(self) -> float:
+        return self.scale
+
+    @property
+    def total_cell_size(self) -> float:
+        return self.scale
+
+    def upload(self, x: int, y: int, w: int, h: int):
+        window = np.s_[y : y + h, x : x + w]
+        obstacles, states = self.grid.obstacles[window], self.grid.states[window]
+        codes = np.where(obstacles != 0, CellState.OBSTACLE.code, states)
+        pixels = np.ascontiguousarray(self.palette[codes])
+        data = image.ImageData(w, h, "RGBA", pixels.tobytes(), pitch=w * 4)
+        self.texture.blit_into(data, x, y, 0)
+
+    def show(self, g: Grid):
+        """Draws another grid of the same size from now on, such as a search overlay"""
+
+        self.grid = g
+        g.track_changes = True
+        g.all_changed = True
+
+    def update(self):
+        w, h = self.grid.size
+        changes = self.grid.flush_changes()
+        if changes is None:
+            self.upload(0, 0, w, h)
+            return
+
+        tiles_across = -(-w // self.TILE)
+        tiles = {
+            (i // w) // self.TILE * tiles_across + (i % w) // self.TILE
+            for i in changes
+        }
+        for tile in tiles:
+            x = tile % tiles_across * self.TILE
+            y = tile // tiles_across * self.TILE
+            self.upload(x, y, min(self.TILE, w - x), min(self.TILE, h - y))
+
+    def visible_cells(self) -> tuple[int, int, int, int] | None:
+        """The range of cells inside the viewport, as the bottom left and size"""
+
+        ox, oy = self.origin
+        vx, vy = self.offset
+        vw, vh = self.viewport
+        x0 = max(0, math.floor((vx - ox) / self.scale))
+        y0 = max(0, math.floor((vy - oy) / self.scale))
+        x1 = min(self.grid.size[0], math.ceil((vx + vw - ox) / self.scale))
+        y1 = min(self.grid.size[1], math.ceil((vy + vh - oy) / self.scale))
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+    def draw(self):
+        visible = self.visible_cells()
+        if not visible:
+            return
+
+        x, y, w, h = visible
+        sx, sy = self.get_cell_position(x, y)
+        region = self.texture.get_region(x, y, w, h)
+        region.blit(sx, sy, width=w * self.scale, height=h * self.scale)
+
+    def pan(self, dx: float, dy: float):
+        self.origin = (self.origin[0] + dx, self.origin[1] + dy)
+
+    def zoom(self, factor: float, x: float, y: float):
+        """Scales the view, keeping the point under `(x, y)` in place"""
+
+        scale = min(self.MAX_SCALE, max(self.MIN_SCALE, self.scale * factor))
+        ox, oy = self.origin
+        self.origin = (
+            x - (x - ox) * scale / self.scale,
+            y - (y - oy) * scale / self.scale,
+        )
+        self.scale = scale
+
+    def get_cell_position(self, x: int, y: int) -> tuple[float, float]:
+        return self.origin[0] + x * self.scale, self.origin[1] + y * self.scale
+
+    def collide_cell(self, x: int, y: int) -> tuple[int, int] | None:
+        vx, vy = self.offset
+        vw, vh = self.viewport
+        if not (vx <= x < vx + vw and vy <= y < vy + vh):
+            return None
+
+        cx = math.floor((x - self.origin[0]) / self.scale)
+        cy = math.floor((y - self.origin[1]) / self.scale)
+        if not self.grid.in_bounds(cx, cy):
+            return None
+
+        return cx, cy
@@ -1,17 +1,47 @@
 from abc import ABC, abstractmethod
+from array import array
+from collections import deque
 from dataclasses import dataclass, field
 import random
+from time import perf_counter
+from typing import TYPE_CHECKING
 
-from grid import CellState, Grid
-from heuristic import HeuristicFunction
+import numpy as np
+
+from grid import ALL_DIRECTIONS, ORTHOGONAL, CellState, Grid
+from heap import IndexedHeap
+from heuristic import HEURISTICS, HeuristicFunction
+from metrics import SearchMetrics
+
+from heapq import heappush
+
+if TYPE_CHECKING:
+    from recording import TraceRecorder
+
+INFINITY = float("inf")
 
-from heapq import heappop, heappush
 
 class SearchAlgorithm(ABC):
+    """A search over a grid's obstacles that records its progress in an overlay
+
+    `map` is the grid the search was created for and `grid` is the search's
+    own overlay of it, so several searches can run over the same map at once.
+    """
+
+    # The name `create_algorithm` knows the algorithm by
+    name: str
+    map: Grid
     grid: Grid
+    dest: tuple[int, int] | None = None
+    unreachable: bool = False
+    # Set while the search is being recorded
+    trace: "TraceRecorder | None" = None
+    metrics: SearchMetrics
 
     def __init__(self, grid: Grid):
-        self.grid = grid
+        self.map = grid
+        self.grid = grid.overlay()
+        self.metrics = SearchMetrics()
 
     @abstractmethod
     def next(self): ...
@@ -19,89 +49,187 @@ class SearchAlgorithm(ABC):
     @abstractmethod
     def dest_found(self) -> bool: ...
 
-    @abstractmethod
-    def start_search(self, src: tuple[int, int], dest: tuple[int, int]): ...
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        """Clears the search's overlay and starts a search from `src` to `dest`
 
-    def generate_neighbors(self, x: int, y: int, target: CellState):
-        cell = self.grid.get_cell(x - 1, y)
-        if cell and cell.state == target:
-            yield cell.pos
+        Subclasses call this before setting up their own frontier. A
+        destination outside the source's component is rejected up front, which
+        makes `done` true before any step is taken.
+        """
+
+        self.grid.reset()
+        self.src = src
+        self.dest = dest
+        self.found = False
+        self.metrics = SearchMetrics()
+        self.unreachable = not self.map.components.connected(src, dest)
 
-        cell = self.grid.get_cell(x, y + 1)
-        if cell and cell.state == target:
-            yield cell.pos
+    def clear(self):
+        """Drops the current search and clears the overlay"""
 
-        cell = self.grid.get_cell(x + 1, y)
-        if cell and cell.state == target:
-            yield cell.pos
+        self.grid.reset()
+        self.dest = None
 
-        cell = self.grid.get_cell(x, y - 1)
-        if cell and cell.state == target:
-            yield cell.pos
+    def path(self) -> list[tuple[int, int]] | None:
+        """The route from the source to the destination, if the algorithm tracks one"""
+
+        return None
+
+    @abstractmethod
+    def frontier_size(self) -> int:
+        """The number of cells waiting to be expanded"""
+
+    def done(self) -> bool:
+        return self.dest_found() or self.unreachable or self.frontier_size() == 0
+
+    def run(
+        self, max_steps: int | None = None, time_budget: float | None = None
+    ) -> int:
+        """Steps the search until it is done or a budget runs out
+
+        Args:
+            max_steps (int | None, optional): The most steps to take. Defaults to None.
+            time_budget (float | None, optional): The most seconds to spend.
+                Defaults to None.
+
+        Returns:
+            int: The number of steps taken
+        """
+
+        metrics = self.metrics
+        start = perf_counter()
+        deadline = None if time_budget is None else start + time_budget
+        steps = 0
+        while not self.done():
+            if max_steps is not None and steps >= max_steps:
+                break
+            if deadline is not None and perf_counter() >= deadline:
+                break
+            if self.trace is not None:
+                self.trace.step()
+            self.next()
+            steps += 1
+            frontier = self.frontier_size()
+            if frontier > metrics.peak_frontier:
+                metrics.peak_frontier = frontier
+        metrics.steps += steps
+        metrics.time += perf_counter() - start
+        return steps
+
+    def generate_walkable_neighbors(self, x: int, y: int):
+        width = self.grid.size[0]
+        i = y * width + x
+        for offset, _ in self.grid.move_table[self.grid.moves[i] & ORTHOGONAL]:
+            j = i + offset
+            yield j % width, j // width
+
+    def generate_neighbors(self, x: int, y: int, target: CellState):
+        """The free cells beside `(x, y)` that are in the `target` state"""
+
+        width = self.grid.size[0]
+        i = y * width + x
+        code = target.code
+        states = self.grid.state_view
+        for offset, _ in self.grid.move_table[self.grid.moves[i] & ORTHOGONAL]:
+            j = i + offset
+            if states[j] == code:
+                yield j % width, j // width
 
 
 class DepthFirstSearch(SearchAlgorithm):
+    name = "dfs"
+
     def __init__(self, grid: Grid):
         super().__init__(grid)
         self.found = False
+        self.open: deque[tuple[int, int]] = deque()
 
     def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
-        self.open = [src]
-        self.dest = dest
-        self.found = False
+        super().start_search(src, dest)
+        self.open = deque([src])
+        self.seen = bytearray(self.grid.size[0] * self.grid.size[1])
+        self.seen[src[1] * self.grid.size[0] + src[0]] = 1
+        self.metrics.pushes += 1
 
     def next(self):
         if len(self.open) == 0:
             return
 
-        x, *self.open = self.open
+        metrics = self.metrics
+        x = self.open.popleft()
+        metrics.pops += 1
         if x == self.dest:
             self.found = True
             return
 
+        width = self.grid.size[0]
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
         for pos in self.generate_neighbors(*x, CellState.NONE):
-            if pos not in self.open:
+            i = pos[1] * width + pos[0]
+            if not self.seen[i]:
+                self.seen[i] = 1
                 self.grid.want_to_visit(*pos)
-                self.open.insert(0, pos)
+                self.open.appendleft(pos)
+                metrics.pushes += 1
 
         self.grid.visit(*x)
 
     def dest_found(self) -> bool:
         return self.found
 
+    def frontier_size(self) -> int:
+        return len(self.open)
+
     def __str__(self) -> str:
         return "Depth-First Search"
 
 
 class BreadthFirstSearch(SearchAlgorithm):
+    name = "bfs"
+
     def __init__(self, grid: Grid):
         super().__init__(grid)
         self.found = False
+        self.open: deque[tuple[int, int]] = deque()
 
     def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
-        self.open = [src]
-        self.dest = dest
-        self.found = False
+        super().start_search(src, dest)
+        self.open = deque([src])
+        self.seen = bytearray(self.grid.size[0] * self.grid.size[1])
+        self.seen[src[1] * self.grid.size[0] + src[0]] = 1
+        self.metrics.pushes += 1
 
     def next(self):
         if len(self.open) == 0:
             return
 
-        x, *self.open = self.open
+        metrics = self.metrics
+        x = self.open.popleft()
+        metrics.pops += 1
         if x == self.dest:
             self.found = True
             return
 
+        width = self.grid.size[0]
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
         for pos in self.generate_neighbors(*x, CellState.NONE):
-            if pos not in self.open:
+            i = pos[1] * width + pos[0]
+            if not self.seen[i]:
+                self.seen[i] = 1
                 self.grid.want_to_visit(*pos)
                 self.open.append(pos)
+                metrics.pushes += 1
 
         self.grid.visit(*x)
 
     def dest_found(self) -> bool:
         return self.found
 
+    def frontier_size(self) -> int:
+        return len(self.open)
+
     def __str__(self) -> str:
         return "Breadth-First Search"
 
@@ -115,41 +243,55 @@ class HeuristicState:
 
 
 class BestFirstSearch(SearchAlgorithm):
-    open: list[HeuristicState] = []
+    name = "best-first"
+    open: IndexedHeap[tuple[int, int]]
     found: bool = False
 
     def __init__(self, grid: Grid, heuristic: HeuristicFunction):
         super().__init__(grid)
         self.heuristic = heuristic
+        self.open = IndexedHeap()
 
     def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
-        self.open = [HeuristicState(self.heuristic.calculate(src), src)]
-        self.dest = dest
-        self.found = False
+        super().start_search(src, dest)
+        self.open = IndexedHeap()
+        self.open.push(src, self.heuristic.calculate(src))
+        self.metrics.pushes += 1
+        self.metrics.heuristic_evaluations += 1
 
     def next(self):
         if len(self.open) == 0:
             return
 
-        x = heappop(self.open).state
+        metrics = self.metrics
+        x, _ = self.open.pop()
+        metrics.pops += 1
         if x == self.dest:
             self.found = True
             return
 
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
         for pos in self.generate_neighbors(*x, CellState.NONE):
             if pos not in self.open:
                 self.grid.want_to_visit(*pos)
-                heappush(self.open, HeuristicState(self.heuristic.calculate(pos), pos))
+                self.open.push(pos, self.heuristic.calculate(pos))
+                metrics.pushes += 1
+                metrics.heuristic_evaluations += 1
 
         self.grid.visit(*x)
 
     def dest_found(self) -> bool:
         return self.found
 
+    def frontier_size(self) -> int:
+        return len(self.open)
+
     def __str__(self) -> str:
         return "Best-First Search"
 
 class HillClimbSearch(SearchAlgorithm):
+    name = "hill-climb"
     open: list[HeuristicState] = []
     found: bool = False
 
@@ -161,24 +303,31 @@ class HillClimbSearch(SearchAlgorithm):
         self.heuristic = heuristic
 
     def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
         self.open = [HeuristicState(self.heuristic.calculate(src), src)]
-        self.dest = dest
-        self.found = False
+        self.metrics.pushes += 1
+        self.metrics.heuristic_evaluations += 1
 
     def next(self):
         if len(self.open) == 0:
             return
 
+        metrics = self.metrics
         x, *self.open = self.open
+        metrics.pops += 1
         if x.state == self.dest:
             self.found = True
             return
 
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
         children = []
         for pos in self.generate_neighbors(*x.state, CellState.NONE):
             if pos not in self.open:
                 self.grid.want_to_visit(*pos)
                 heappush(children, HeuristicState(self.heuristic.calculate(pos), pos))
+                metrics.pushes += 1
+                metrics.heuristic_evaluations += 1
         
         self.open = children + self.open
         self.grid.visit(*x.state)
@@ -186,92 +335,1027 @@ class HillClimbSearch(SearchAlgorithm):
     def dest_found(self) -> bool:
         return self.found
 
+    def frontier_size(self) -> int:
+        return len(self.open)
+
 class GreedyHillClimbSearch(SearchAlgorithm):
+    name = "greedy-hill-climb"
     found: bool = False
-    path: list[HeuristicState] = []
+    route: list[HeuristicState] = []
 
     def __init__(self, grid: Grid, heuristic: HeuristicFunction):
         super().__init__(grid)
         self.heuristic = heuristic
 
     def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
-        self.path = [HeuristicState(self.heuristic.calculate(src), src)]
-        self.dest = dest
-        self.found = False
+        super().start_search(src, dest)
+        self.route = [HeuristicState(self.heuristic.calculate(src), src)]
+        self.metrics.pushes += 1
+        self.metrics.heuristic_evaluations += 1
 
     def next(self):
-        if len(self.path) == 0:
+        if len(self.route) == 0:
             self.found = True
             return
 
-        cur = self.path[len(self.path)-1]
+        cur = self.route[len(self.route)-1]
         if cur.state == self.dest:
             self.found = True
             return
 
         self.grid.visit(*cur.state)
 
+        metrics = self.metrics
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
         for pos in self.generate_neighbors(*cur.state, CellState.NONE):
             h = HeuristicState(self.heuristic.calculate(pos), pos)
+            metrics.heuristic_evaluations += 1
             if h < cur:
                 self.grid.want_to_visit(*pos)
-                self.path.append(h)
+                self.route.append(h)
+                metrics.pushes += 1
                 return
 
-        self.path.pop()
+        self.route.pop()
+        metrics.pops += 1
 
     def dest_found(self) -> bool:
         return self.found
 
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found or not self.route:
+            return None
+        return [h.state for h in self.route]
+
+    def frontier_size(self) -> int:
+        return len(self.route)
+
     def __str__(self) -> str:
         return "Greedy Hill Climbing Search"
 
 class TabuSearch(SearchAlgorithm):
+    name = "tabu"
     found: bool = False
-    path: list[HeuristicState] = []
+    route: list[HeuristicState] = []
 
     def __init__(self, grid: Grid, heuristic: HeuristicFunction):
         super().__init__(grid)
         self.heuristic = heuristic
 
     def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
-        self.path = [HeuristicState(self.heuristic.calculate(src), src)]
-        self.dest = dest
-        self.found = False
+        super().start_search(src, dest)
+        self.route = [HeuristicState(self.heuristic.calculate(src), src)]
+        self.metrics.pushes += 1
+        self.metrics.heuristic_evaluations += 1
 
     def next(self):
-        if len(self.path) == 0:
+        if len(self.route) == 0:
             self.found = True
             return
 
-        cur = self.path[len(self.path)-1]
+        cur = self.route[len(self.route)-1]
         if cur.state == self.dest:
             self.found = True
             return
 
         self.grid.visit(*cur.state)
 
+        metrics = self.metrics
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
         children = list(self.generate_neighbors(*cur.state, CellState.NONE))
         for pos in children:
             h = HeuristicState(self.heuristic.calculate(pos), pos)
+            metrics.heuristic_evaluations += 1
             if h < cur:
                 self.grid.want_to_visit(*pos)
-                self.path.append(h)
+                self.route.append(h)
+                metrics.pushes += 1
                 return
 
         if len(children) == 0:
-            self.path.pop()
+            self.route.pop()
+            metrics.pops += 1
         else:
             value = random.sample(children, 1)[0]
 
             h = HeuristicState(self.heuristic.calculate(value), value)
             self.grid.want_to_visit(*value)
-            self.path.append(h)
+            self.route.append(h)
+            metrics.pushes += 1
+            metrics.heuristic_evaluations += 1
             
 
 
     def dest_found(self) -> bool:
         return self.found
 
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found or not self.route:
+            return None
+        return [h.state for h in self.route]
+
+    def frontier_size(self) -> int:
+        return len(self.route)
+
+    def __str__(self) -> str:
+        return "Tabu Search"
+
+
+class CostSearch(SearchAlgorithm):
+    """Expands cells in order of `f = g + weight * h`, tracking costs and parents
+
+    Costs and parents are kept in flat arrays with one slot per cell, where a
+    parent is stored as the index of the cell it was reached from.
+    """
+
+    found: bool = False
+
+    def __init__(
+        self,
+        grid: Grid,
+        heuristic: HeuristicFunction | None,
+        weight: float = 1.0,
+        diagonal: bool = False,
+    ):
+        super().__init__(grid)
+        self.heuristic = heuristic
+        self.weight = weight
+        self.diagonal = diagonal
+        self.directions = ALL_DIRECTIONS if diagonal else ORTHOGONAL
+        self.open: IndexedHeap[int] = IndexedHeap()
+
+    def estimate(self, pos: tuple[int, int]) -> float:
+        if self.heuristic is None or self.weight == 0:
+            return 0
+        self.metrics.heuristic_evaluations += 1
+        return self.weight * self.heuristic.calculate(pos)
+
+    def successors(self, i: int, pos: tuple[int, int]):
+        """The flat indices of the cells reachable from cell `i`, with move costs"""
+
+        return self.grid.neighbors(i, self.directions)
+
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
+        cells = self.grid.size[0] * self.grid.size[1]
+        self.cost = array("d", [float("inf")]) * cells
+        self.parent = array("i", [-1]) * cells
+        self.closed = bytearray(cells)
+
+        i = src[1] * self.grid.size[0] + src[0]
+        h = self.estimate(src)
+        self.cost[i] = 0
+        self.open = IndexedHeap()
+        self.open.push(i, (h, h))
+        self.metrics.pushes += 1
+
+    def next(self):
+        if len(self.open) == 0:
+            return
+
+        metrics = self.metrics
+        width = self.grid.size[0]
+        i, _ = self.open.pop()
+        metrics.pops += 1
+        x = (i % width, i // width)
+        if x == self.dest:
+            self.found = True
+            return
+
+        self.closed[i] = 1
+        cost = self.cost[i]
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
+        for j, step in self.successors(i, x):
+            g = cost + step
+            if self.closed[j] or g >= self.cost[j]:
+                continue
+
+            pos = (j % width, j // width)
+            h = self.estimate(pos)
+            if j not in self.open:
+                self.grid.want_to_visit(*pos)
+                metrics.pushes += 1
+            else:
+                metrics.duplicates += 1
+            self.cost[j] = g
+            self.parent[j] = i
+            self.open.push_or_decrease(j, (g + h, h))
+
+        self.grid.visit(*x)
+
+    def dest_found(self) -> bool:
+        return self.found
+
+    def frontier_size(self) -> int:
+        return len(self.open)
+
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found:
+            return None
+        dest = self.dest
+        assert dest is not None
+
+        width = self.grid.size[0]
+        i = dest[1] * width + dest[0]
+        path = []
+        while i != -1:
+            path.append((i % width, i // width))
+            i = self.parent[i]
+        path.reverse()
+        return path
+
+
+class AStarSearch(CostSearch):
+    name = "astar"
+
+    def __init__(
+        self, grid: Grid, heuristic: HeuristicFunction, diagonal: bool = False
+    ):
+        super().__init__(grid, heuristic, diagonal=diagonal)
+
+    def __str__(self) -> str:
+        return "A* Search"
+
+
+class WeightedAStarSearch(CostSearch):
+    name = "weighted-astar"
+
+    def __init__(
+        self,
+        grid: Grid,
+        heuristic: HeuristicFunction,
+        w: float = 2.0,
+        diagonal: bool = False,
+    ):
+        super().__init__(grid, heuristic, w, diagonal)
+
+    def __str__(self) -> str:
+        return f"Weighted A* Search (w={self.weight:g})"
+
+
+class DijkstraSearch(CostSearch):
+    name = "dijkstra"
+
+    def __init__(self, grid: Grid, diagonal: bool = False):
+        super().__init__(grid, None, 0, diagonal)
+
+    def __str__(self) -> str:
+        return "Dijkstra Search"
+
+
+class BidirectionalBreadthFirstSearch(SearchAlgorithm):
+    """Breadth-first search grown from both ends until the two sides meet
+
+    Each step expands one cell, working through a whole layer of the side
+    with the smaller frontier before picking a side again. A cell reached
+    from one side is never queued by the other; reaching it from the other
+    side is a meeting instead. The search stops at the end of the layer the
+    first meeting happens in, keeping the shortest route through the
+    meetings of that layer.
+    """
+
+    name = "bidirectional-bfs"
+
+    def __init__(self, grid: Grid):
+        super().__init__(grid)
+        self.found = False
+        self.sides: tuple[deque[int], deque[int]] = (deque(), deque())
+
+    def __str__(self) -> str:
+        return "Bidirectional Breadth-First Search"
+
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
+        width = self.grid.size[0]
+        cells = width * self.grid.size[1]
+        # The side that reached each cell, 1 from the source and 2 from the
+        # destination, with its distance from that side's end and its parent
+        self.owner = bytearray(cells)
+        self.depth = array("i", [0]) * cells
+        self.parent = array("i", [-1]) * cells
+        self.sides = (deque(), deque())
+        self.side = 0
+        self.layer = 0
+        self.best = INFINITY
+        self.meeting: tuple[int, int] | None = None
+
+        for side, (x, y) in enumerate((src, dest)):
+            i = y * width + x
+            if self.owner[i]:
+                self.found = True
+                self.meeting = (i, i)
+                return
+            self.owner[i] = side + 1
+            self.sides[side].append(i)
+            self.metrics.pushes += 1
+
+    def frontier_size(self) -> int:
+        return len(self.sides[0]) + len(self.sides[1])
+
+    def done(self) -> bool:
+        # Once either side runs out, the two ends cannot be joined
+        return (
+            self.found or self.unreachable or not (self.sides[0] and self.sides[1])
+        )
+
+    def next(self):
+        if self.done():
+            return
+
+        if self.layer == 0:
+            self.side = 0 if len(self.sides[0]) <= len(self.sides[1]) else 1
+            self.layer = len(self.sides[self.side])
+
+        side = self.side
+        owner = side + 1
+        metrics = self.metrics
+        width = self.grid.size[0]
+        i = self.sides[side].popleft()
+        self.layer -= 1
+        depth = self.depth[i] + 1
+        metrics.pops += 1
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
+        for j, _ in self.grid.neighbors(i):
+            if not self.owner[j]:
+                self.owner[j] = owner
+                self.depth[j] = depth
+                self.parent[j] = i
+                self.grid.want_to_visit(j % width, j // width)
+                self.sides[side].append(j)
+                metrics.pushes += 1
+            elif self.owner[j] != owner and depth + self.depth[j] < self.best:
+                self.best = depth + self.depth[j]
+                self.meeting = (i, j) if side == 0 else (j, i)
+
+        self.grid.visit(i % width, i // width)
+        if self.layer == 0 and self.meeting is not None:
+            self.found = True
+
+    def dest_found(self) -> bool:
+        return self.found
+
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found:
+            return None
+
+        meeting = self.meeting
+        assert meeting is not None
+        width = self.grid.size[0]
+        forward, backward = meeting
+        path = []
+        while forward != -1:
+            path.append((forward % width, forward // width))
+            forward = self.parent[forward]
+        path.reverse()
+        if backward == meeting[0]:
+            backward = self.parent[backward]
+        while backward != -1:
+            path.append((backward % width, backward // width))
+            backward = self.parent[backward]
+        return path
+
+
+class BidirectionalAStarSearch(SearchAlgorithm):
+    """A* grown from both ends, towards the destination and back to the source
+
+    Both sides order cells by cost plus the average potential
+    `p = (h_dest - h_src) / 2`, added on the forward side and subtracted on
+    the backward side, where `h_src` is a heuristic of the same kind aimed at
+    the source. With consistent heuristics, both sides then search the same
+    graph of non-negative reduced costs, so the bidirectional Dijkstra rule
+    applies: every time one side reaches a cell the other has a cost for,
+    the route through it is kept if it is the cheapest seen, and the search
+    stops once the two lowest keys add up to at least that route's cost.
+    Each step expands a cell of the side with the smaller frontier.
+    """
+
+    name = "bidirectional-astar"
+    found: bool = False
+
+    def __init__(
+        self, grid: Grid, heuristic: HeuristicFunction, diagonal: bool = False
+    ):
+        super().__init__(grid)
+        self.heuristic = heuristic
+        self.backward = type(heuristic)(heuristic.size)
+        self.diagonal = diagonal
+        self.directions = ALL_DIRECTIONS if diagonal else ORTHOGONAL
+        self.sides: tuple[IndexedHeap[int], IndexedHeap[int]] = (
+            IndexedHeap(),
+            IndexedHeap(),
+        )
+
+    def __str__(self) -> str:
+        return "Bidirectional A* Search"
+
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
+        width = self.grid.size[0]
+        cells = width * self.grid.size[1]
+        self.backward.set_target(src)
+        self.cost = (array("d", [INFINITY]) * cells, array("d", [INFINITY]) * cells)
+        self.parent = (array("i", [-1]) * cells, array("i", [-1]) * cells)
+        self.closed = (bytearray(cells), bytearray(cells))
+        self.sides = (IndexedHeap(), IndexedHeap())
+        self.best = INFINITY
+        self.meeting = -1
+
+        for side, (x, y) in enumerate((src, dest)):
+            i = y * width + x
+            self.cost[side][i] = 0
+            self.sides[side].push(i, self.key(side, 0, (x, y)))
+            self.metrics.pushes += 1
+        if src == dest:
+            self.best = 0
+            self.meeting = src[1] * width + src[0]
+
+    def key(self, side: int, g: float, pos: tuple[int, int]) -> tuple[float, float]:
+        """The priority of a cell on one side, with ties going to the one nearer
+        the other end"""
+
+        to_dest = self.heuristic.calculate(pos)
+        to_src = self.backward.calculate(pos)
+        self.metrics.heuristic_evaluations += 2
+        if side == 0:
+            return g + (to_dest - to_src) / 2, to_dest
+        return g + (to_src - to_dest) / 2, to_src
+
+    def frontier_size(self) -> int:
+        return len(self.sides[0]) + len(self.sides[1])
+
+    def done(self) -> bool:
+        return (
+            self.found or self.unreachable or not (self.sides[0] and self.sides[1])
+        )
+
+    def next(self):
+        if self.done():
+            return
+
+        forward, backward = self.sides
+        if forward.peek()[1][0] + backward.peek()[1][0] >= self.best:
+            self.found = True
+            return
+
+        side = 0 if len(forward) <= len(backward) else 1
+        cost, other = self.cost[side], self.cost[1 - side]
+        closed, parent = self.closed[side], self.parent[side]
+        frontier = self.sides[side]
+        metrics = self.metrics
+        width = self.grid.size[0]
+        i, _ = frontier.pop()
+        closed[i] = 1
+
+        g_i = cost[i]
+        metrics.pops += 1
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
+        for j, step in self.grid.neighbors(i, self.directions):
+            g = g_i + step
+            if closed[j] or g >= cost[j]:
+                continue
+
+            pos = (j % width, j // width)
+            if j in frontier:
+                metrics.duplicates += 1
+            else:
+                metrics.pushes += 1
+                if other[j] == INFINITY:
+                    self.grid.want_to_visit(*pos)
+            cost[j] = g
+            parent[j] = i
+            frontier.push_or_decrease(j, self.key(side, g, pos))
+            if g + other[j] < self.best:
+                self.best = g + other[j]
+                self.meeting = j
+
+        self.grid.visit(i % width, i // width)
+
+    def dest_found(self) -> bool:
+        return self.found
+
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found:
+            return None
+
+        width = self.grid.size[0]
+        path = []
+        i = self.meeting
+        while i != -1:
+            path.append((i % width, i // width))
+            i = self.parent[0][i]
+        path.reverse()
+        i = self.parent[1][self.meeting]
+        while i != -1:
+            path.append((i % width, i // width))
+            i = self.parent[1][i]
+        return path
+
+
+def _next_event(events: np.ndarray, axis: int) -> np.ndarray:
+    """For every cell, the index of the next event along an axis, or the axis length"""
+
+    n = events.shape[axis]
+    index = np.arange(n, dtype=np.int32).reshape((-1, 1) if axis == 0 else (1, -1))
+    first = np.where(events, index, np.int32(n))
+    first = np.flip(np.minimum.accumulate(np.flip(first, axis), axis=axis), axis)
+
+    result = np.full_like(first, n)
+    if axis == 0:
+        result[:-1] = first[1:]
+    else:
+        result[:, :-1] = first[:, 1:]
+    return result
+
+
+def _previous_event(events: np.ndarray, axis: int) -> np.ndarray:
+    """For every cell, the index of the last event before it along an axis, or -1"""
+
+    n = events.shape[axis]
+    index = np.arange(n, dtype=np.int32).reshape((-1, 1) if axis == 0 else (1, -1))
+    last = np.maximum.accumulate(np.where(events, index, np.int32(-1)), axis=axis)
+
+    result = np.full_like(last, -1)
+    if axis == 0:
+        result[1:] = last[:-1]
+    else:
+        result[:, 1:] = last[:, :-1]
+    return result
+
+
+class JumpPointSearch(CostSearch):
+    """A* over jump points for 4-connected grids with uniform move costs
+
+    Among equally short paths, only those that move horizontally before
+    turning vertically are considered. A vertical move may only turn
+    sideways when the cell beside the previous one is blocked, and a
+    horizontal move only stops where a vertical jump would find something.
+    The first stop along every row and column is precomputed with NumPy when
+    the search starts, so each jump is a table lookup. Only jump points are
+    reported to the grid.
+    """
+
+    name = "jps"
+
+    def __str__(self) -> str:
+        return "Jump Point Search"
+
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
+        self.build_jump_tables()
+
+    def build_jump_tables(self):
+        free = self.grid.obstacles == 0
+        padded = np.pad(free, 1, constant_values=False)
+        east, west = padded[1:-1, 2:], padded[1:-1, :-2]
+
+        # A vertical move is forced to turn where the cell beside it is open
+        # but the cell beside the previous one is not
+        forced_north = free & ((east & ~padded[:-2, 2:]) | (west & ~padded[:-2, :-2]))
+        forced_south = free & ((east & ~padded[2:, 2:]) | (west & ~padded[2:, :-2]))
+        north = _next_event(~free | forced_north, 0)
+        south = _previous_event(~free | forced_south, 0)
+
+        height = free.shape[0]
+        north_found = (north < height) & np.take_along_axis(
+            free, np.minimum(north, height - 1), 0
+        )
+        south_found = (south >= 0) & np.take_along_axis(free, np.maximum(south, 0), 0)
+        stops = free & (north_found | south_found)
+        self.tables = {
+            (0, 1): north,
+            (0, -1): south,
+            (1, 0): _next_event(~free | stops, 1),
+            (-1, 0): _previous_event(~free | stops, 1),
+        }
+        self.views = {
+            direction: table.reshape(-1).data
+            for direction, table in self.tables.items()
+        }
+
+    def jump_vertical(self, x: int, y: int, dy: int) -> tuple[int, int] | None:
+        w, h = self.grid.size
+        stop = self.views[(0, dy)][y * w + x]
+        dest = self.dest
+        assert dest is not None
+        gx, gy = dest
+        if gx == x and ((y < gy <= stop) if dy > 0 else (stop <= gy < y)):
+            return dest
+        if 0 <= stop < h and not self.grid.obstacle_view[stop * w + x]:
+            return x, stop
+        return None
+
+    def jump_horizontal(self, x: int, y: int, dx: int) -> tuple[int, int] | None:
+        w = self.grid.size[0]
+        stop = self.views[(dx, 0)][y * w + x]
+        dest = self.dest
+        assert dest is not None
+        gx, gy = dest
+        if (x < gx <= stop) if dx > 0 else (stop <= gx < x):
+            if gy == y:
+                return dest
+
+            # The destination's column is crossed, check whether it is in sight
+            dy = 1 if gy > y else -1
+            if gx != stop and self.jump_vertical(gx, y, dy) == dest:
+                return gx, y
+        if 0 <= stop < w and not self.grid.obstacle_view[y * w + stop]:
+            return stop, y
+        return None
+
+    def successors(self, i: int, pos: tuple[int, int]):
+        w = self.grid.size[0]
+        x, y = pos
+        parent = self.parent[i]
+        if parent == -1:
+            jumps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+        elif parent // w == y:
+            dx = 1 if x > parent % w else -1
+            jumps = [(dx, 0), (0, 1), (0, -1)]
+        else:
+            dy = 1 if y > parent // w else -1
+            jumps = [(0, dy)]
+            obstacles = self.grid.obstacle_view
+            for dx in (1, -1):
+                if not self.grid.in_bounds(x + dx, y):
+                    continue
+                beside, behind = y * w + x + dx, (y - dy) * w + x + dx
+                if obstacles[behind] and not obstacles[beside]:
+                    jumps.append((dx, 0))
+
+        for dx, dy in jumps:
+            if dy == 0:
+                point = self.jump_horizontal(x, y, dx)
+            else:
+                point = self.jump_vertical(x, y, dy)
+            if point:
+                yield point[1] * w + point[0], abs(point[0] - x) + abs(point[1] - y)
+
+    def path(self) -> list[tuple[int, int]] | None:
+        points = super().path()
+        if not points:
+            return points
+
+        path = [points[0]]
+        for x, y in points[1:]:
+            px, py = path[-1]
+            dx, dy = (x > px) - (x < px), (y > py) - (y < py)
+            while (px, py) != (x, y):
+                px, py = px + dx, py + dy
+                path.append((px, py))
+        return path
+
+
+class HierarchicalSearch(SearchAlgorithm):
+    """HPA*: A* over the grid's cluster abstraction, refined into a path of cells
+
+    The source and destination are joined to the entrances of their own
+    clusters, then every step expands one abstract node. The abstraction is
+    cached on the grid, so it is built once for every search over the map.
+    """
+
+    name = "hpa"
+    found: bool = False
+
+    def __init__(
+        self, grid: Grid, heuristic: HeuristicFunction, cluster_size: int = 16
+    ):
+        super().__init__(grid)
+        self.heuristic = heuristic
+        self.cluster_size = cluster_size
+        self.open: IndexedHeap[int] = IndexedHeap()
+
+    def __str__(self) -> str:
+        return "Hierarchical A* Search"
+
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
+        self.hierarchy = self.map.hierarchy(self.cluster_size)
+        width = self.grid.size[0]
+        self.start = src[1] * width + src[0]
+        self.goal = dest[1] * width + dest[0]
+        self.route: list[tuple[int, int]] | None = None
+
+        distance, _ = self.hierarchy.explore(self.goal)
+        self.exits = {i: d for i, d in distance.items() if self.hierarchy.is_node(i)}
+        distance, _ = self.hierarchy.explore(self.start)
+        self.entries = {
+            i: d
+            for i, d in distance.items()
+            if i == self.goal or self.hierarchy.is_node(i)
+        }
+
+        self.cost = {self.start: 0}
+        self.parent = {self.start: -1}
+        self.closed: set[int] = set()
+        h = self.heuristic.calculate(src)
+        self.open = IndexedHeap()
+        self.open.push(self.start, (h, h))
+        self.metrics.pushes += 1
+        self.metrics.heuristic_evaluations += 1
+
+    def successors(self, i: int):
+        if i == self.start:
+            yield from self.entries.items()
+        yield from self.hierarchy.neighbors(i)
+        if i in self.exits:
+            yield self.goal, self.exits[i]
+
+    def next(self):
+        if len(self.open) == 0:
+            return
+
+        metrics = self.metrics
+        width = self.grid.size[0]
+        i, _ = self.open.pop()
+        metrics.pops += 1
+        if i == self.goal:
+            self.found = True
+            return
+
+        self.closed.add(i)
+        cost = self.cost[i]
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
+        for j, step in self.successors(i):
+            g = cost + step
+            if j in self.closed or g >= self.cost.get(j, float("inf")):
+                continue
+
+            pos = (j % width, j // width)
+            h = self.heuristic.calculate(pos)
+            metrics.heuristic_evaluations += 1
+            if j not in self.open:
+                self.grid.want_to_visit(*pos)
+                metrics.pushes += 1
+            else:
+                metrics.duplicates += 1
+            self.cost[j] = g
+            self.parent[j] = i
+            self.open.push_or_decrease(j, (g + h, h))
+
+        self.grid.visit(i % width, i // width)
+
+    def dest_found(self) -> bool:
+        return self.found
+
+    def frontier_size(self) -> int:
+        return len(self.open)
+
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found:
+            return None
+
+        if self.route is None:
+            nodes = []
+            i = self.goal
+            while i != -1:
+                nodes.append(i)
+                i = self.parent[i]
+            nodes.reverse()
+            self.route = self.hierarchy.refine(nodes)
+        return self.route
+
+
+class LifelongPlanningAStarSearch(SearchAlgorithm):
+    """LPA*: A* that repairs its search tree when obstacles change
+
+    Every cell has a cost `g` and a one-step lookahead `rhs`, the best cost
+    through any of its neighbours. Only cells where the two disagree are
+    queued. When obstacles change, just the cells next to the edits are
+    re-evaluated and the search resumes from there, so a small edit costs a
+    small repair instead of a new search.
+    """
+
+    name = "lpa"
+    found: bool = False
+
+    def __init__(self, grid: Grid, heuristic: HeuristicFunction):
+        super().__init__(grid)
+        self.heuristic = heuristic
+        self.open: IndexedHeap[int] = IndexedHeap()
+        self.recheck = False
+        self.map.subscribe(self)
+
     def __str__(self) -> str:
-        return "Tabu Search"
\ No newline at end of file
+        return "Lifelong Planning A* Search"
+
+    def start_search(self, src: tuple[int, int], dest: tuple[int, int]):
+        super().start_search(src, dest)
+        width, height = self.grid.size
+        self.g = array("d", [INFINITY]) * (width * height)
+        self.rhs = array("d", [INFINITY]) * (width * height)
+        self.start = src[1] * width + src[0]
+        self.goal = dest[1] * width + dest[0]
+
+        self.rhs[self.start] = 0
+        self.open = IndexedHeap()
+        self.open.push(self.start, self.key(self.start))
+        self.metrics.pushes += 1
+
+    def key(self, i: int) -> tuple[float, float]:
+        width = self.grid.size[0]
+        cost = min(self.g[i], self.rhs[i])
+        self.metrics.heuristic_evaluations += 1
+        return cost + self.heuristic.calculate((i % width, i // width)), cost
+
+    def adjacent(self, i: int):
+        """The flat indices of the cells beside cell `i`, blocked or not"""
+
+        width, height = self.grid.size
+        x, y = i % width, i // width
+        if x > 0:
+            yield i - 1
+        if y < height - 1:
+            yield i + width
+        if x < width - 1:
+            yield i + 1
+        if y > 0:
+            yield i - width
+
+    def neighbors(self, i: int):
+        for offset, _ in self.grid.move_table[self.grid.moves[i] & ORTHOGONAL]:
+            yield i + offset
+
+    def update_cell(self, i: int):
+        metrics = self.metrics
+        if i != self.start:
+            metrics.neighbor_calls += 1
+            self.rhs[i] = min(
+                (self.g[j] + 1 for j in self.neighbors(i)), default=INFINITY
+            )
+        if self.g[i] != self.rhs[i]:
+            if i not in self.open:
+                width = self.grid.size[0]
+                self.grid.want_to_visit(i % width, i // width)
+                metrics.pushes += 1
+            else:
+                metrics.duplicates += 1
+            self.open.update(i, self.key(i))
+        elif i in self.open:
+            self.open.remove(i)
+            metrics.pops += 1
+
+    def clear(self):
+        super().clear()
+        self.recheck = False
+
+    def settled(self) -> bool:
+        goal = self.goal
+        if self.rhs[goal] != self.g[goal]:
+            return False
+        return not self.open or self.open.peek()[1] >= self.key(goal)
+
+    def obstacles_changed(self, cells: list[int] | None):
+        if self.dest is None:
+            return
+        if cells is None:
+            self.start_search(self.src, self.dest)
+            return
+
+        for i in cells:
+            self.update_cell(i)
+            for j in self.adjacent(i):
+                self.update_cell(j)
+        self.found = self.unreachable = False
+        self.recheck = True
+
+    def next(self):
+        if self.recheck:
+            # The labels may not have seen the edit yet when it is reported
+            self.recheck = False
+            dest = self.dest
+            assert dest is not None
+            self.unreachable = not self.map.components.connected(self.src, dest)
+            if self.unreachable:
+                return
+
+        if len(self.open) == 0 or self.settled():
+            self.found = self.g[self.goal] < INFINITY
+            return
+
+        metrics = self.metrics
+        width = self.grid.size[0]
+        i, _ = self.open.pop()
+        metrics.pops += 1
+        if self.g[i] > self.rhs[i]:
+            self.g[i] = self.rhs[i]
+            self.grid.visit(i % width, i // width)
+        else:
+            self.g[i] = INFINITY
+            self.update_cell(i)
+        metrics.expansions += 1
+        metrics.neighbor_calls += 1
+        for j in self.neighbors(i):
+            self.update_cell(j)
+
+        self.found = self.settled() and self.g[self.goal] < INFINITY
+
+    def dest_found(self) -> bool:
+        return self.found
+
+    def frontier_size(self) -> int:
+        return len(self.open)
+
+    def done(self) -> bool:
+        # An edit may queue nothing, but its recheck still needs a step to
+        # restore found and unreachable
+        return not self.recheck and super().done()
+
+    def path(self) -> list[tuple[int, int]] | None:
+        if not self.found:
+            return None
+
+        width = self.grid.size[0]
+        i = self.goal
+        path = [(i % width, i // width)]
+        while i != self.start:
+            i = min(self.neighbors(i), key=self.g.__getitem__)
+            path.append((i % width, i // width))
+        path.reverse()
+        return path
+
+
+ALGORITHMS = (
+    "bfs",
+    "bidirectional-bfs",
+    "dfs",
+    "best-first",
+    "hill-climb",
+    "greedy-hill-climb",
+    "tabu",
+    "dijkstra",
+    "astar",
+    "bidirectional-astar",
+    "weighted-astar",
+    "jps",
+    "hpa",
+    "lpa",
+)
+
+
+def create_algorithm(
+    name: str,
+    grid: Grid,
+    heuristic: HeuristicFunction,
+    weight: float = 2.0,
+    diagonal: bool = False,
+) -> SearchAlgorithm:
+    """Creates one of the `ALGORITHMS` by name
+
+    `diagonal` lets Dijkstra and the A* searches move diagonally as well, at
+    a cost of sqrt(2); the other algorithms only move orthogonally.
+    """
+
+    match name:
+        case "bfs":
+            return BreadthFirstSearch(grid)
+        case "bidirectional-bfs":
+            return BidirectionalBreadthFirstSearch(grid)
+        case "dfs":
+            return DepthFirstSearch(grid)
+        case "best-first":
+            return BestFirstSearch(grid, heuristic)
+        case "hill-climb":
+            return HillClimbSearch(grid, heuristic)
+        case "greedy-hill-climb":
+            return GreedyHillClimbSearch(grid, heuristic)
+        case "tabu":
+            return TabuSearch(grid, heuristic)
+        case "dijkstra":
+            return DijkstraSearch(grid, diagonal)
+        case "astar":
+            return AStarSearch(grid, heuristic, diagonal)
+        case "bidirectional-astar":
+            return BidirectionalAStarSearch(grid, heuristic, diagonal)
+        case "weighted-astar":
+            return WeightedAStarSearch(grid, heuristic, weight, diagonal)
+        case "jps":
+            return JumpPointSearch(grid, heuristic)
+        case "hpa":
+            return HierarchicalSearch(grid, heuristic)
+        case "lpa":
+            return LifelongPlanningAStarSearch(grid, heuristic)
+    raise ValueError(f"Unknown algorithm: {name}")
+
+
+def algorithm_spec(algo: SearchAlgorithm) -> tuple[str, str | None, float, bool]:
+    """The arguments `create_algorithm` recreates `algo` from
+
+    Returns:
+        tuple[str, str | None, float, bool]: The algorithm's name, the name of
+            its heuristic in `HEURISTICS` if it has one, its weight and
+            whether it moves diagonally
+    """
+
+    heuristic = getattr(algo, "heuristic", None)
+    heuristic_name = None
+    for key, cls in HEURISTICS.items():
+        if type(heuristic) is cls:
+            heuristic_name = key
+    weight = getattr(algo, "weight", 2.0)
+    return algo.name, heuristic_name, weight, getattr(algo, "diagonal", False)
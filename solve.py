@@ -0,0 +1,122 @@
+"""Runs a search to completion without rendering and prints its results as JSON
+
+With `--cache`, results are kept in a file and a query asked again on the
+same map is answered from it without searching.
+
+Example: `python solve.py last_open.map 1,1 20,3 --algorithm astar`
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+from cache import CachedResult, QueryCache
+from grid import CellState, Grid
+from heuristic import HEURISTICS
+from search import ALGORITHMS, create_algorithm
+
+
+def parse_position(text: str) -> tuple[int, int]:
+    x, y = text.split(",")
+    return int(x), int(y)
+
+
+def solve(
+    grid: Grid,
+    algorithm: str,
+    heuristic: str,
+    src: tuple[int, int],
+    dest: tuple[int, int],
+    weight: float = 2.0,
+    max_steps: int | None = None,
+    diagonal: bool = False,
+    cache: QueryCache | None = None,
+) -> dict:
+    """Runs one query, answering it from `cache` when it was run before
+
+    Searches cut short by `max_steps` are neither looked up nor stored.
+    """
+
+    start = perf_counter()
+    if max_steps is not None:
+        cache = None
+
+    spec = (algorithm, heuristic, weight, diagonal)
+    result = cache.get(grid, spec, src, dest) if cache is not None else None
+    cached = result is not None
+    if result is None:
+        h = HEURISTICS[heuristic](grid.size)
+        algo = create_algorithm(algorithm, grid, h, weight, diagonal)
+        h.set_target(dest)
+        algo.start_search(src, dest)
+        algo.run(max_steps)
+        if cache is not None:
+            result = cache.put(grid, spec, src, dest, algo)
+        else:
+            path = algo.path()
+            path = None if path is None else tuple(path)
+            result = CachedResult(algo.dest_found(), path, algo.metrics)
+    elapsed = perf_counter() - start
+
+    path = result.path
+    return {
+        "algorithm": algorithm,
+        "heuristic": heuristic,
+        "src": src,
+        "dest": dest,
+        "found": result.found,
+        **result.metrics.as_dict(),
+        "path_length": len(path) - 1 if path else None,
+        "cached": cached,
+        "wall_time": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("map", help="a text or binary map file")
+    parser.add_argument("src", type=parse_position, help="source cell as x,y")
+    parser.add_argument("dest", type=parse_position, help="destination cell as x,y")
+    parser.add_argument("-a", "--algorithm", choices=ALGORITHMS, default="astar")
+    parser.add_argument("--heuristic", choices=list(HEURISTICS), default="manhattan")
+    parser.add_argument("--weight", type=float, default=2.0, help="for weighted-astar")
+    parser.add_argument("--max-steps", type=int, help="give up after this many steps")
+    parser.add_argument(
+        "--diagonal",
+        action="store_true",
+        help="allow diagonal moves in dijkstra and the A* searches",
+    )
+    parser.add_argument("--cache", help="a file of earlier results to reuse and add to")
+    args = parser.parse_args()
+
+    grid = Grid(0, 0)
+    start = perf_counter()
+    grid.load_from_file(args.map)
+    load_time = perf_counter() - start
+    for name, (x, y) in (("src", args.src), ("dest", args.dest)):
+        if not grid.in_bounds(x, y):
+            w, h = grid.size
+            parser.error(f"{name} {x},{y} is outside the {w}x{h} map")
+        if grid.get_state(x, y) == CellState.OBSTACLE:
+            parser.error(f"{name} {x},{y} is an obstacle")
+
+    cache = QueryCache(path=args.cache) if args.cache else None
+    result = solve(
+        grid,
+        args.algorithm,
+        args.heuristic,
+        args.src,
+        args.dest,
+        args.weight,
+        args.max_steps,
+        args.diagonal,
+        cache,
+    )
+    if cache is not None:
+        cache.save()
+    result = {"map": args.map, "load_time": load_time, **result}
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Runs every algorithm on random queries over many maps in parallel
+
+Each map's obstacle plane is placed in shared memory once and attached by
+the worker processes, so jobs only carry the algorithm, map and query.
+Results are written to a CSV file as they finish.
+
+Example: `python sweep.py maps/*.bmap --queries 100 --out results.csv`
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from grid import Grid
+from heuristic import HEURISTICS
+from metrics import FIELDS as METRIC_FIELDS
+from search import ALGORITHMS
+from solve import solve
+
+FIELDS = [
+    "map",
+    "algorithm",
+    "heuristic",
+    "seed",
+    "src_x",
+    "src_y",
+    "dest_x",
+    "dest_y",
+    "found",
+    *METRIC_FIELDS,
+    "path_length",
+    "wall_time",
+]
+
+
+@dataclass(frozen=True)
+class SharedMap:
+    path: str
+    memory: str
+    size: tuple[int, int]
+
+
+@dataclass(frozen=True)
+class Job:
+    algorithm: str
+    map: int
+    src: tuple[int, int]
+    dest: tuple[int, int]
+    seed: int
+
+
+# Per worker process: the shared maps and the grids attached to them
+_maps: list[SharedMap] = []
+_grids: dict[int, tuple[shared_memory.SharedMemory, Grid]] = {}
+_options: dict = {}
+
+
+def _init_worker(maps: list[SharedMap], options: dict):
+    _maps[:] = maps
+    _options.update(options)
+
+
+def _attach(index: int) -> Grid:
+    if index not in _grids:
+        shared = _maps[index]
+        memory = shared_memory.SharedMemory(shared.memory)
+        w, h = shared.size
+        obstacles = np.ndarray((h, w), dtype=np.uint8, buffer=memory.buf)
+        obstacles.flags.writeable = False
+        _grids[index] = (memory, Grid.from_obstacles(obstacles))
+    return _grids[index][1]
+
+
+def _run(job: Job) -> dict:
+    random.seed(job.seed)
+    grid = _attach(job.map)
+    result = solve(
+        grid,
+        job.algorithm,
+        _options["heuristic"],
+        job.src,
+        job.dest,
+        max_steps=_options["max_steps"],
+    )
+    return {
+        **result,
+        "algorithm": job.algorithm,
+        "map": _maps[job.map].path,
+        "seed": job.seed,
+        "src_x": job.src[0],
+        "src_y": job.src[1],
+        "dest_x": job.dest[0],
+        "dest_y": job.dest[1],
+    }
+
+
+def random_queries(
+    grid: Grid, count: int, rng: np.random.Generator
+) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+    free = np.flatnonzero(grid.obstacles.reshape(-1) == 0)
+    if len(free) == 0:
+        return []
+
+    w = grid.size[0]
+    cells = rng.choice(free, size=(count, 2)).tolist()
+    return [((src % w, src // w), (dest % w, dest // w)) for src, dest in cells]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("maps", nargs="+", help="text or binary map files")
+    parser.add_argument("-a", "--algorithms", nargs="+", choices=ALGORITHMS)
+    parser.add_argument("--heuristic", choices=list(HEURISTICS), default="manhattan")
+    parser.add_argument("--queries", type=int, default=10, help="queries per map")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-steps", type=int, help="give up after this many steps")
+    parser.add_argument("--out", default="results.csv")
+    args = parser.parse_args()
+
+    algorithms = args.algorithms or ALGORITHMS
+    rng = np.random.default_rng(args.seed)
+    memories: list[shared_memory.SharedMemory] = []
+    maps: list[SharedMap] = []
+    jobs: list[Job] = []
+    try:
+        for index, path in enumerate(args.maps):
+            grid = Grid(0, 0)
+            grid.load_from_file(path)
+
+            size = max(1, grid.obstacles.size)
+            memory = shared_memory.SharedMemory(create=True, size=size)
+            memories.append(memory)
+            plane = np.ndarray(grid.obstacles.shape, dtype=np.uint8, buffer=memory.buf)
+            plane[:] = grid.obstacles
+            maps.append(SharedMap(path, memory.name, grid.size))
+
+            for src, dest in random_queries(grid, args.queries, rng):
+                seed = int(rng.integers(2**31))
+                jobs.extend(Job(name, index, src, dest, seed) for name in algorithms)
+
+        options = {"heuristic": args.heuristic, "max_steps": args.max_steps}
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(maps, options),
+        )
+        with open(args.out, "w", newline="") as file, pool:
+            writer = csv.DictWriter(file, FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            futures = [pool.submit(_run, job) for job in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                writer.writerow(future.result())
+                file.flush()
+                print(f"\r{done}/{len(jobs)}", end="", file=sys.stderr, flush=True)
+        print(file=sys.stderr)
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+
+if __name__ == "__main__":
+    main()
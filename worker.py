@@ -0,0 +1,172 @@
+"""Running a search in a worker process while the window keeps drawing
+
+The worker process runs its own copy of the search over its own copy of the
+map. After every batch of steps, it sends the changes the batch made as
+trace events (see `recording`) through a bounded queue, and the window
+applies them to the search's overlay once per frame. A full queue holds the
+worker back until the window catches up. Obstacle edits are made on the
+window's map right away and sent to the worker, which replans if it can.
+"""
+
+from array import array
+import multiprocessing
+import queue
+from time import perf_counter
+
+import numpy as np
+
+from grid import Grid
+from heuristic import HEURISTICS
+from metrics import SearchMetrics
+from recording import TraceRecorder, apply_events
+from search import SearchAlgorithm, algorithm_spec, create_algorithm
+
+# Seconds of search in every batch sent to the window
+BATCH_TIME = 1 / 60
+# Batches waiting to be drawn before the worker is held back
+DELTA_QUEUE_SIZE = 32
+
+
+def _work(
+    spec: tuple[str, str | None, float, bool],
+    obstacles: np.ndarray,
+    src: tuple[int, int],
+    dest: tuple[int, int],
+    trace_path: str | None,
+    deltas: multiprocessing.Queue,
+    commands: multiprocessing.Queue,
+):
+    name, heuristic_name, weight, diagonal = spec
+    grid = Grid.from_obstacles(obstacles)
+    # Algorithms without a heuristic ignore the one they are given
+    heuristic = HEURISTICS[heuristic_name or "distance"](grid.size)
+    heuristic.set_target(dest)
+    algo = create_algorithm(name, grid, heuristic, weight, diagonal)
+    algo.start_search(src, dest)
+
+    recorder = TraceRecorder(algo) if trace_path else None
+    events = recorder.events if recorder else array("I")
+    algo.grid.journal = events
+    sent = handled = 0
+    while True:
+        # Wait for edits once there is nothing left to search
+        block = algo.done()
+        while True:
+            try:
+                x, y = commands.get(block)
+            except queue.Empty:
+                break
+            block = False
+            grid.toggle_obstacle(x, y)
+            handled += 1
+
+        algo.run(time_budget=BATCH_TIME)
+        result = None
+        if algo.done():
+            if recorder is not None and trace_path is not None:
+                recorder.finish()
+                recorder.save(trace_path)
+                recorder = None
+            result = {"found": algo.dest_found(), "path": algo.path()}
+
+        deltas.put((events[sent:].tobytes(), handled, result, algo.metrics))
+        if recorder is None:
+            events = algo.grid.journal = array("I")
+            sent = 0
+        else:
+            sent = len(events)
+
+
+class SearchWorker:
+    """A search running in a worker process, drawn into the overlay of `algo`
+
+    It stands in for the search it runs: `grid`, `metrics`, `done`,
+    `dest_found` and `path` behave as they do on the algorithm, with the
+    metrics as of the last batch drawn.
+    """
+
+    def __init__(
+        self,
+        algo: SearchAlgorithm,
+        src: tuple[int, int],
+        dest: tuple[int, int],
+        trace_path: str | None = None,
+    ):
+        spec = algorithm_spec(algo)
+        if spec[1] is None and getattr(algo, "heuristic", None) is not None:
+            raise ValueError(f"{algo} uses a heuristic the worker cannot recreate")
+        algo.clear()
+        self.algo = algo
+        self.grid = algo.grid
+        self.src = src
+        self.dest = dest
+        self.sent = self.handled = 0
+        self.result: dict | None = None
+        self.metrics = SearchMetrics()
+
+        self.deltas = multiprocessing.Queue(DELTA_QUEUE_SIZE)
+        self.commands = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_work,
+            args=(
+                spec,
+                np.array(algo.map.obstacles),
+                src,
+                dest,
+                trace_path,
+                self.deltas,
+                self.commands,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def __str__(self) -> str:
+        return str(self.algo)
+
+    def update(self, time_budget: float):
+        """Applies the batches that have arrived, for at most `time_budget` seconds"""
+
+        deadline = perf_counter() + time_budget
+        while perf_counter() < deadline:
+            try:
+                events, handled, result, metrics = self.deltas.get_nowait()
+            except queue.Empty:
+                break
+            # The window's map already has every edit the worker makes
+            apply_events(self.grid, np.frombuffer(events, np.uint32), obstacles=False)
+            self.handled = handled
+            self.result = result
+            self.metrics = metrics
+        else:
+            return
+
+        if self.result is None and not self.process.is_alive():
+            self.result = {"found": False, "path": None}
+            self.handled = self.sent
+
+    def toggle_obstacle(self, x: int, y: int):
+        """Passes an edit made on the window's map on to the worker"""
+
+        self.commands.put((x, y))
+        self.sent += 1
+        self.result = None
+
+    def done(self) -> bool:
+        return self.result is not None and self.handled == self.sent
+
+    def dest_found(self) -> bool:
+        result = self.result
+        return result is not None and self.done() and result["found"]
+
+    def path(self) -> list[tuple[int, int]] | None:
+        result = self.result
+        return result["path"] if result is not None and self.done() else None
+
+    def stop(self):
+        """Ends the worker, leaving what it has drawn so far in the overlay"""
+
+        self.process.terminate()
+        self.process.join()
+        self.commands.cancel_join_thread()
+        self.deltas.cancel_join_thread()